@@ -0,0 +1,249 @@
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import simpy
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main as run_sim
+
+# ------------ Scaling benchmark (headless) ------------
+# Runs generated scenarios that scale one dimension at a time and reports wall
+# time, SimPy events/s, emitted events/s and peak RSS. Each case runs in a
+# fresh process so its peak RSS is its own.
+#
+#   python bench.py --suite vehicles --out bench_results.json          # record a baseline
+#   python bench.py --compare bench_results.json --threshold 0.15      # rerun it, flag regressions
+#                                                                      # (into bench_compare.json)
+#   python bench.py --compare old.json --against new.json              # compare two result files
+#   python bench.py --engine partitioned --suite workers               # does the partitioned engine scale?
+#
+# Partitioned runs are profiled and also report their critical path: per window
+# the busiest worker's CPU time, summed. That plus the coordinator's time is the
+# wall time with a core per worker, so the workers suite shows the scaling even
+# on a machine with fewer cores than workers (segment_cpu_s / critical_path_s is
+# the speedup of the segment work).
+
+DEFAULTS = {"vehicles": 100, "rsus": 1, "road_length": 1000, "intersection_spacing": 200, "workers": 1}
+
+# Each suite varies one scenario parameter over these values; the rest stay at
+# DEFAULTS, updated with the suite's own defaults where it has any
+SUITES = {
+    "vehicles": ("vehicles", [10, 100, 1000, 10_000, 100_000]),
+    "rsus": ("rsus", [1, 4, 16, 64, 1024]),
+    "road": ("road_length", [1000, 5000, 20_000]),
+    "intersections": ("intersection_spacing", [400, 200, 50, 10]),
+    # partitioning.workers (engine: partitioned only), on a scenario big enough to split
+    "workers": ("workers", [1, 2, 4, 8], {"vehicles": 20_000, "rsus": 16, "road_length": 20_000}),
+}
+
+
+class CountingSink:
+    """Event sink that only counts what it is given (and keeps the run's profile)."""
+    def __init__(self):
+        self.count = 0
+        self.profile = None
+
+    def put(self, event):
+        self.count += 1
+        if event.get("type") == "SIM_END":
+            self.profile = event.get("profile")
+
+
+class CountingEnvironment(simpy.Environment):
+    """simpy.Environment that counts the events it processes."""
+    def __init__(self, initial_time=0):
+        super().__init__(initial_time)
+        self.steps = 0
+
+    def step(self):
+        super().step()
+        self.steps += 1
+
+
+def make_scenario(base, vehicles, rsus, road_length, intersection_spacing, workers):
+    """Scenario with the given size, built on the scenario_simple.yaml settings.
+
+    The run lasts long enough for an average vehicle to drive the whole road,
+    so a longer road means a longer run, not just unreachable intersections.
+    """
+    config = copy.deepcopy(base)
+    config["vehicles"]["count"] = vehicles
+    # RSUs spread evenly along the road, each covering a fifth of its share
+    spacing = road_length / rsus
+    config["rsus"]["sites"] = [{"position": (i + 0.1) * spacing, "range": 0.2 * spacing} for i in range(rsus)]
+    config["intersections"]["positions"] = list(range(intersection_spacing, road_length, intersection_spacing))
+    mean_speed = (config["vehicles"]["min_speed"] + config["vehicles"]["max_speed"]) / 2
+    config["simulation_time"] = round(road_length / mean_speed)
+    config["partitioning"] = dict(config.get("partitioning") or {}, workers=workers)
+    if config.get("engine") == "partitioned":
+        config["profiling"] = dict(config.get("profiling") or {}, enabled=True)
+    return config
+
+
+def partition_times(profile):
+    """Segment CPU, critical path and coordinator seconds of a profiled partitioned run."""
+    def seconds(*phases):
+        return sum(stats["time_s"] for phase, stats in profile.items() if phase in phases)
+    segment_cpu = sum(stats["time_s"] for phase, stats in profile.items()
+                      if phase.startswith("segment") and phase.endswith(".advance"))
+    coordinator = seconds("partition.coordinator", "partition.rebalance")
+    if "segment1.advance" not in profile:
+        # A single segment runs in the coordinator's process, inside its timed phase
+        coordinator = max(0.0, coordinator - segment_cpu)
+    return {"segment_cpu_s": segment_cpu,
+            "critical_path_s": seconds("partition.critical_path"),
+            "coordinator_s": coordinator}
+
+
+def run_case(base, params, level, repeat, seed):
+    """Runs one case `repeat` times in this process; keeps the fastest run."""
+    config = make_scenario(base, **dict(DEFAULTS, **params))  # Baselines may predate a parameter
+    best = None
+    for _ in range(repeat):
+        sink = CountingSink()
+        start = time.perf_counter()
+        env = run_sim(EventLogger(sink, level), config, seed, environment=CountingEnvironment)
+        wall = time.perf_counter() - start
+        # The vectorized and partitioned engines have no environment
+        simpy_events = env.steps if env is not None else None
+        if best is None or wall < best["wall_s"]:
+            best = {"wall_s": wall, "simpy_events": simpy_events, "emitted_events": sink.count}
+            if sink.profile and "partition.critical_path" in sink.profile:
+                best.update(partition_times(sink.profile))
+    best["simpy_events_per_s"] = best["simpy_events"] / best["wall_s"] if best["simpy_events"] else None
+    best["emitted_events_per_s"] = best["emitted_events"] / best["wall_s"]
+    best["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    return best
+
+
+def run_isolated(base, params, level, repeat, seed):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_case, base, params, level, repeat, seed).result()
+
+
+def cases_for(suites, max_vehicles=None):
+    cases = []
+    for suite in suites:
+        key, values, *defaults = SUITES[suite]
+        for value in values:
+            params = dict(DEFAULTS, **(defaults[0] if defaults else {}), **{key: value})
+            if max_vehicles is None or params["vehicles"] <= max_vehicles:
+                cases.append((f"{suite}:{value}", params))
+    return cases
+
+
+def run_benchmarks(base, cases, engine, mobility, level, repeat, seed):
+    base = copy.deepcopy(base)
+    base["engine"], base["mobility"] = engine, mobility
+    results = []
+    for name, params in cases:
+        result = run_isolated(base, params, level, repeat, seed)
+        results.append({"case": name, "params": params, **result})
+        print(f"{name:<22} {result['wall_s']:8.3f} s  "
+              f"{_rate(result['simpy_events_per_s']):>10} simpy ev/s  "
+              f"{_rate(result['emitted_events_per_s']):>10} emitted ev/s  "
+              f"{result['peak_rss_mb']:8.1f} MB"
+              + (f"  critical path {result['critical_path_s']:.3f} s of {result['segment_cpu_s']:.3f} s "
+                 f"segment CPU (+{result['coordinator_s']:.3f} s coordinator)"
+                 if "critical_path_s" in result else ""), flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "simpy": simpy.__version__, "cpus": os.cpu_count(), "engine": engine, "mobility": mobility,
+            "level": level, "repeat": repeat, "seed": seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(old, new, threshold):
+    """Returns (case, metric, old, new, change) for every metric that got worse than threshold."""
+    regressions = []
+    old_by_case = {r["case"]: r for r in old["results"]}
+    for r in new["results"]:
+        before = old_by_case.get(r["case"])
+        if before is None:
+            continue
+        # Lower is better for time and memory, higher is better for throughput
+        for metric, lower_is_better in (("wall_s", True), ("peak_rss_mb", True),
+                                        ("simpy_events_per_s", False), ("emitted_events_per_s", False)):
+            a, b = before.get(metric), r.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            if (change if lower_is_better else -change) > threshold:
+                regressions.append((r["case"], metric, a, b, change))
+    return regressions
+
+
+def _rate(value):
+    return "-" if value is None else f"{value:,.0f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the simulation core")
+    parser.add_argument("--config", default=DEFAULT_CONFIG,
+                        help="base scenario the generated ones start from")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="suite(s) to run (default: all)")
+    parser.add_argument("--max-vehicles", type=int, default=None, help="skip cases with more vehicles")
+    parser.add_argument("--engine", default="simpy", choices=["simpy", "vectorized", "partitioned"])
+    parser.add_argument("--mobility", default="stepped", choices=["stepped", "event_driven"])
+    parser.add_argument("--level", default="normal", choices=["summary", "normal", "verbose"],
+                        help="events the benchmark subscribes to (verbose includes every V2V_RECEIVE)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="results file (default: bench_results.json, "
+                                       "or bench_compare.json when rerunning a --compare baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="rerun the baseline's cases and flag regressions")
+    parser.add_argument("--against", metavar="RESULTS", help="with --compare: compare this file instead of rerunning")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = parser.parse_args()
+    if args.suite and "workers" in args.suite and args.engine != "partitioned":
+        parser.error("--suite workers needs --engine partitioned")
+    if args.out is None:
+        args.out = "bench_compare.json" if args.compare else "bench_results.json"
+    if args.compare and not args.against and os.path.abspath(args.out) == os.path.abspath(args.compare):
+        parser.error("--out must not overwrite the --compare baseline")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if args.against:
+            with open(args.against) as f:
+                new = json.load(f)
+        else:
+            base = load_config(args.config)
+            if base.get("type") == "FATAL_ERROR":
+                sys.exit(f"{base['message']} ({base['path']})")
+            meta = old["meta"]
+            cases = [(r["case"], r["params"]) for r in old["results"]]
+            new = run_benchmarks(base, cases, meta["engine"], meta["mobility"],
+                                 meta["level"], meta["repeat"], meta["seed"])
+            with open(args.out, "w") as f:
+                json.dump(new, f, indent=2)
+        regressions = compare(old, new, args.threshold)
+        for case, metric, a, b, change in regressions:
+            print(f"REGRESSION {case:<22} {metric:<22} {a:12.4g} -> {b:12.4g} ({change:+.1%})")
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    base = load_config(args.config)
+    if base.get("type") == "FATAL_ERROR":
+        sys.exit(f"{base['message']} ({base['path']})")
+    suites = args.suite or [s for s in SUITES if s != "workers" or args.engine == "partitioned"]
+    cases = cases_for(suites, args.max_vehicles)
+    report = run_benchmarks(base, cases, args.engine, args.mobility, args.level, args.repeat, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.out}")
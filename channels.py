@@ -0,0 +1,180 @@
+import heapq
+import math
+from collections import deque
+
+# ------------ Message Store (time-ordered, TTL-expiring) ------------
+class MessageStore:
+    """Append-only message log that expires old entries from the front.
+
+    Messages must be appended in nondecreasing "time" order (as they are when
+    appended at `env.now`), so expired messages always form a prefix and are
+    dropped with `popleft` in amortized O(1). Every message gets a sequence
+    number; a reader keeps that number as a cursor and asks only for what it
+    has not processed yet.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._items = deque()  # (seq, msg)
+        self._next_seq = 0
+        self._expired_at = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for _, msg in self._items:
+            yield msg
+
+    @property
+    def cursor(self):
+        """Cursor positioned after the newest message."""
+        return self._next_seq
+
+    def append(self, msg):
+        seq = self._next_seq
+        self._items.append((seq, msg))
+        self._next_seq += 1
+        return seq
+
+    def expire(self, now):
+        """Drops messages older than `now - ttl` and returns the dropped (seq, msg) pairs.
+
+        Runs at most once per time instant, later calls at the same `now` are no-ops.
+        """
+        if now == self._expired_at:
+            return []
+        self._expired_at = now
+        cutoff = now - self.ttl
+        dropped = []
+        while self._items and self._items[0][1]["time"] < cutoff:
+            dropped.append(self._items.popleft())
+        return dropped
+
+    def since(self, cursor):
+        """Returns (messages appended at or after `cursor`, new cursor)."""
+        new = []
+        for seq, msg in reversed(self._items):
+            if seq < cursor:
+                break
+            new.append(msg)
+        new.reverse()
+        return new, self._next_seq
+
+# ------------ V2V Channel (spatially bucketed broadcast medium) ------------
+class V2VChannel:
+    """Shared V2V medium with messages bucketed by road position.
+
+    Cells are `cell_size` meters wide (normally the V2V range), so every sender
+    within range of a receiver lies in the receiver's own cell or one of its two
+    neighbours. The channel is backed by a MessageStore: expiry pops the oldest
+    message off the store and off the front of its cell, and receivers still
+    see messages in the order they were sent.
+    """
+
+    def __init__(self, cell_size, ttl):
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.store = MessageStore(ttl)
+        self.cells = {}
+
+    def _cell(self, pos):
+        return int(pos // self.cell_size)
+
+    def __len__(self):
+        return len(self.store)
+
+    def append(self, msg):
+        seq = self.store.append(msg)
+        self.cells.setdefault(self._cell(msg["pos"]), deque()).append((seq, msg))
+
+    def expire(self, now):
+        """Expires old messages (see MessageStore.expire) and returns how many were dropped."""
+        dropped = self.store.expire(now)
+        for _, msg in dropped:
+            c = self._cell(msg["pos"])
+            cell = self.cells[c]
+            cell.popleft()
+            if not cell:
+                del self.cells[c]
+        return len(dropped)
+
+    def nearby(self, pos, rng):
+        """Yields live messages sent within `rng` of `pos`, in send order."""
+        c = self._cell(pos)
+        span = math.ceil(rng / self.cell_size)
+        buckets = [self.cells[k] for k in range(c - span, c + span + 1) if k in self.cells]
+        for _, m in heapq.merge(*buckets, key=lambda e: e[0]):
+            if abs(pos - m["pos"]) <= rng:
+                yield m
+
+# ------------ RSU Mailboxes (V2R and ACK traffic sharded per RSU) ------------
+class RsuMailboxes:
+    """Per-RSU inboxes for V2R messages and broadcast ACKs.
+
+    V2R messages are queued per RSU id; ACKs are further indexed by the
+    sequence number of the broadcast they acknowledge, so an RSU only ever
+    touches its own traffic.
+    """
+
+    def __init__(self):
+        self.v2r = {}   # rid -> deque of messages
+        self.acks = {}  # rid -> {broadcast seq: deque of ACKs}
+
+    def send_v2r(self, rid, msg):
+        self.v2r.setdefault(rid, deque()).append(msg)
+
+    def drain_v2r(self, rid):
+        """Removes and returns this RSU's V2R messages in arrival order."""
+        box = self.v2r.pop(rid, None)
+        return list(box) if box else []
+
+    def send_ack(self, rid, msg):
+        self.acks.setdefault(rid, {}).setdefault(msg["seq"], deque()).append(msg)
+
+    def drain_acks(self, rid, seq):
+        """Removes and returns the ACKs for broadcast `seq` in arrival order.
+
+        Broadcast sequence numbers of an RSU only ever move forward, so ACKs
+        still queued for any other (older) broadcast can never match again and
+        are dropped.
+        """
+        by_broadcast = self.acks.pop(rid, None)
+        if not by_broadcast:
+            return []
+        return list(by_broadcast.get(seq, ()))
+
+    def detach(self, rid):
+        """Removes and returns everything queued for this RSU, for attach() elsewhere."""
+        return self.v2r.pop(rid, None), self.acks.pop(rid, None)
+
+    def attach(self, rid, boxes):
+        v2r, acks = boxes
+        if v2r:
+            self.v2r[rid] = v2r
+        if acks:
+            self.acks[rid] = acks
+
+# ------------ RSU Broadcast Register (latest broadcast by sequence number) ------------
+class BroadcastRegister:
+    """One RSU's broadcasts: a sequence counter and the latest message.
+
+    Every published message gets the next sequence number (from 0) as "seq".
+    A receiver remembers the last seq it has seen and finds out whether there
+    is anything new with one comparison, however long the run has been.
+    """
+
+    def __init__(self):
+        self.seq = -1
+        self.latest = None
+
+    def publish(self, msg):
+        self.seq += 1
+        msg["seq"] = self.seq
+        self.latest = msg
+        return self.seq
+
+    def newer_than(self, seen_seq):
+        """The latest broadcast if it is newer than `seen_seq`, else None."""
+        if self.seq > seen_seq:
+            return self.latest
+        return None
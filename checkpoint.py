@@ -0,0 +1,138 @@
+import argparse
+import copy
+import pickle
+import random
+import sys
+
+import simpy
+
+from coverage import rsu_sites
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, start_processes
+from simstate import SimState
+
+# ------------ Checkpoint and fork (warm-up once, many what-if runs) ------------
+# Every run starts with all vehicles at pos 0.0. warm_up() runs a scenario up
+# to a chosen time and keeps the whole SimState (vehicles, RSU tables,
+# mailboxes, channels, logs and the RNG); main(..., checkpoint=cp) continues
+# a private copy of it with the variant's config, as often as needed:
+#
+#   cp = warm_up(config, 300, seed=7)
+#   for interval in (1, 5, 10):
+#       variant = copy.deepcopy(config)
+#       variant["rsus"]["broadcast_interval"] = interval
+#       main(logger, variant, checkpoint=cp)
+#
+# Continuing with the unchanged config reproduces the uninterrupted run event
+# for event. Parameters read as the run goes (broadcast_interval, v2v_range,
+# v2v_message_ttl, wait probabilities, time_step, simulation_time, ...) take
+# effect at the fork; what was already drawn (vehicle speeds) or built (RSU
+# sites) during the warm-up stays, and restore() refuses configs that change
+# the vehicle count or the RSU sites. Simpy engine with stepped mobility only.
+#
+#   python checkpoint.py --config scenario_simple.yaml --seed 7 --at 300 --out warm.ckpt
+#   python -m simulate --checkpoint warm.ckpt --set rsus.broadcast_interval=1
+
+# Config keys a fork cannot change (check_fork_params() rejects them and their parents)
+FIXED_AT_FORK = ("engine", "mobility", "vehicles.count",
+                 "rsus.count", "rsus.position", "rsus.range", "rsus.sites")
+
+
+def _check_supported(config):
+    if config.get("engine", "simpy") != "simpy" or config.get("mobility", "stepped") != "stepped":
+        raise ValueError("checkpoints need engine: simpy and mobility: stepped")
+
+
+def _check_until(config, until):
+    if not 0 < until < config["simulation_time"]:
+        raise ValueError(f"warm-up must end within the simulation (0 < {until} < {config['simulation_time']})")
+
+
+def check_fork_params(config, params, until):
+    """Raises ValueError unless runs with `params` ({dotted key: values}) can fork
+    from a warm-up of `config` up to `until`; cheap enough to call before any warm-up.
+    """
+    _check_supported(config)
+    _check_until(config, until)
+    fixed = [key for key in params
+             if any(key == f or key.startswith(f + ".") or f.startswith(key + ".") for f in FIXED_AT_FORK)]
+    if fixed:
+        raise ValueError(f"{', '.join(fixed)} cannot change after a warm-up "
+                         f"(fixed at the fork: {', '.join(FIXED_AT_FORK)})")
+    if any(t <= until for t in params.get("simulation_time", ())):
+        raise ValueError(f"simulation_time must stay after the warm-up ({until})")
+
+
+class Checkpoint:
+    """A simulation paused between two instants, with the config it was warmed up with."""
+
+    def __init__(self, sim, config):
+        self.sim = sim
+        self.config = config
+
+    @property
+    def time(self):
+        return self.sim.time
+
+    def restore(self, config, seed=None):
+        """A private copy of the state, ready to continue under `config`.
+
+        seed: reseeds the continuation (default: go on with the warm-up's RNG,
+        so every variant sees the same random numbers)
+        """
+        _check_supported(config)
+        if config["vehicles"]["count"] != len(self.sim.vehicles):
+            raise ValueError(f"checkpoint has {len(self.sim.vehicles)} vehicles, config asks for "
+                             f"{config['vehicles']['count']}")
+        if rsu_sites(config) != self.sim.sites:
+            raise ValueError("the RSU sites of a checkpoint cannot be changed")
+        sim = copy.deepcopy(self.sim)
+        sim.v2v_channel.store.ttl = config["vehicles"].get("v2v_message_ttl", 5)
+        if seed is not None:
+            sim.rng = random.Random(seed)
+        return sim
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def warm_up(config, until, seed=None, log_queue=None):
+    """Runs `config` up to simulated time `until` and returns the Checkpoint there.
+
+    log_queue: gets the warm-up's events, like main()'s (default: none are built)
+    """
+    _check_supported(config)
+    _check_until(config, until)
+    logger = log_queue if isinstance(log_queue, EventLogger) else EventLogger(log_queue)
+    # Always a private RNG: its state is part of the checkpoint
+    sim = SimState(config, random.Random(seed))
+    env = simpy.Environment()
+    start_processes(env, sim, config, logger)
+    env.run(until=until)
+    sim.time = env.now
+    return Checkpoint(sim, copy.deepcopy(config))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm up a scenario and save a checkpoint to fork runs from")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="scenario YAML")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible warm-up")
+    parser.add_argument("--at", type=float, required=True, help="simulated time to stop and checkpoint at")
+    parser.add_argument("--out", default="warm.ckpt", help="checkpoint file")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if config.get("type") == "FATAL_ERROR":
+        sys.exit(f"{config['message']} ({config['path']})")
+    try:
+        checkpoint = warm_up(config, args.at, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    checkpoint.save(args.out)
+    print(f"Checkpoint at t={checkpoint.time}s written to {args.out}")
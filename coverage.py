@@ -0,0 +1,110 @@
+import bisect
+
+# ------------ RSU deployment and coverage index ------------
+# RSU i covers the closed interval [position, position + range] of the road.
+# The scenario either lists every RSU under rsus.sites or gives one shared
+# position/range for rsus.count RSUs:
+#
+#   rsus:
+#     range: 200                 # default range for sites that omit it
+#     sites:
+#       - {position: 100}
+#       - {position: 1500, range: 300}
+
+
+def rsu_sites(config):
+    """The RSUs of a scenario as [{"id", "position", "range"}], indexed by id."""
+    rsus = config["rsus"]
+    if "sites" in rsus:
+        return [{"id": i, "position": site["position"], "range": site.get("range", rsus.get("range"))}
+                for i, site in enumerate(rsus["sites"])]
+    return [{"id": i, "position": rsus["position"], "range": rsus["range"]} for i in range(rsus["count"])]
+
+
+class CoverageIndex:
+    """Which RSUs cover a road position, and which vehicles each RSU covers.
+
+    The sorted interval end points split the road into elementary segments.
+    The RSUs covering each end point and each open segment between two end
+    points are precomputed, so covering(x) is a bisect plus the k RSUs it
+    returns: O(log R + k) however many RSUs line the road.
+
+    Vehicles report their position with place() (or enter()/leave() when they
+    track coverage edges themselves), which keeps members(rid) current, so an
+    RSU reads the vehicles in its range without sweeping every vehicle.
+    """
+
+    def __init__(self, sites):
+        self.sites = sites
+        self.bounds = sorted({s["position"] for s in sites} | {s["position"] + s["range"] for s in sites})
+        self.starting_at, self.ending_at = {}, {}
+        for s in sites:
+            self.starting_at.setdefault(s["position"], []).append(s["id"])
+            self.ending_at.setdefault(s["position"] + s["range"], []).append(s["id"])
+
+        # Sweep the end points: _at[j] covers bounds[j], _between[j] covers (bounds[j], bounds[j + 1])
+        self._at, self._between = [], []
+        active = set()
+        for b in self.bounds:
+            active.update(self.starting_at.get(b, ()))
+            self._at.append(tuple(sorted(active)))
+            active.difference_update(self.ending_at.get(b, ()))
+            self._between.append(tuple(sorted(active)))
+
+        self._members = [set() for _ in sites]
+        self._placed = {}  # vid -> RSUs covering its last placed position
+
+    def covering(self, x):
+        """Ids of the RSUs whose range contains x, in ascending order."""
+        j = bisect.bisect_right(self.bounds, x) - 1
+        if j < 0:
+            return ()
+        return self._at[j] if self.bounds[j] == x else self._between[j]
+
+    def slots(self):
+        """The precomputed answers as flat lists, for array lookups (see vectorized.py).
+
+        Returns (offsets, rids): slot 0 is before the first end point, slot 2j + 1
+        is bounds[j] itself and slot 2j + 2 the open segment after it; the RSUs
+        covering slot s are rids[offsets[s]:offsets[s + 1]].
+        """
+        offsets, rids = [0, 0], []
+        for at, between in zip(self._at, self._between):
+            for ids in (at, between):
+                rids.extend(ids)
+                offsets.append(len(rids))
+        return offsets, rids
+
+    def next_edge(self, x):
+        """First coverage start or end strictly after x (None past the last RSU)."""
+        j = bisect.bisect_right(self.bounds, x)
+        return self.bounds[j] if j < len(self.bounds) else None
+
+    def place(self, vid, x):
+        """Moves a vehicle to x and returns the RSUs covering it there."""
+        new = self.covering(x)
+        old = self._placed.get(vid, ())
+        if new is not old and new != old:
+            for rid in old:
+                if rid not in new:
+                    self._members[rid].discard(vid)
+            for rid in new:
+                if rid not in old:
+                    self._members[rid].add(vid)
+            self._placed[vid] = new
+        return new
+
+    def remove(self, vid):
+        """Forgets a placed vehicle (e.g. one handed over to another index)."""
+        for rid in self._placed.pop(vid, ()):
+            self._members[rid].discard(vid)
+
+    def enter(self, vid, rid):
+        self._members[rid].add(vid)
+
+    def leave(self, vid, rid):
+        self._members[rid].discard(vid)
+
+    def members(self, rid):
+        """The vehicles currently inside RSU rid's range (a live set, do not modify)."""
+        return self._members[rid]
@@ -0,0 +1,269 @@
+import math
+import random
+
+# ------------ Event-driven mobility (`mobility: event_driven`) ------------
+# A vehicle moves at constant speed between intersections, so its position is
+# linear in time and the next instant at which anything can change is known in
+# closed form: the next intersection, the next RSU coverage edge (from the
+# coverage index, however many RSUs there are), the next RSU
+# broadcast while covered, or the next VEHICLE_MOVE sample the consumer asked
+# for (`vehicles.move_sample_interval`, none by default). The vehicle sleeps
+# straight until that instant instead of waking up every time_step.
+#
+# Vehicles publish a trajectory in vehicles_state ({"pos", "speed", "since"}),
+# which is what rsu() and V2V delivery evaluate instead of a per-step position.
+
+EPS = 1e-9
+SLACK = 1e-6  # meters
+
+
+class V2VDelivery:
+    """V2V medium for event-driven vehicles.
+
+    A message is heard once by each vehicle, at the first instant of its
+    lifetime (send time + TTL) at which that vehicle is within range. That
+    instant is computed from the receiver's trajectory and scheduled as a
+    SimPy timeout; when a vehicle changes trajectory (stops or resumes at an
+    intersection) its pending deliveries are invalidated and recomputed.
+
+    Candidate receivers of a message come from a cell index over position
+    keys. A vehicle's key is its position when it was indexed (re-keyed at
+    least every TTL), and vehicles only move forward at no more than
+    max_speed. So between `indexed_at` and now it has moved at most
+    max_speed * (now - indexed_at) past its key, and a post only looks at
+    the cells that bound can reach instead of at every vehicle.
+    """
+
+    def __init__(self, env, channel, vehicles_state, logger, v2v_range, ttl, max_speed):
+        self.env = env
+        self.channel = channel
+        self.vehicles_state = vehicles_state
+        self.logger = logger
+        # Deliveries only produce V2V_RECEIVE events: without a subscriber none are scheduled
+        self.enabled = logger.wants("V2V_RECEIVE")
+        self.v2v_range = v2v_range
+        self.ttl = ttl
+        self.version = {}  # vid -> trajectory version
+        self.heard = {}    # vid -> {message key: send time}
+        self.max_speed = max_speed
+        self.cell_size = v2v_range if v2v_range > 0 else 1.0
+        self.keys = {}     # vid -> position key (see above)
+        self.cells = {}    # cell of a key -> {vid}
+        self.indexed_at = env.now
+
+    @staticmethod
+    def _key(msg):
+        return (msg["from"], msg["time"], msg["type"])
+
+    def post(self, msg):
+        if not self.enabled:
+            return
+        self.channel.expire(self.env.now)
+        self.channel.append(msg)
+        for vid in self._candidates(msg):
+            self._schedule(vid, msg)
+
+    def _index(self, vid, key):
+        old = self.keys.get(vid)
+        if old is not None:
+            self.cells[int(old // self.cell_size)].discard(vid)
+        self.keys[vid] = key
+        self.cells.setdefault(int(key // self.cell_size), set()).add(vid)
+
+    def _candidates(self, msg):
+        """Vehicles that may come within range of msg before it expires, in vid order."""
+        now = self.env.now
+        if now - self.indexed_at > self.ttl:
+            # Re-key everyone at their current position so the drift bound stays small
+            self.indexed_at = now
+            for vid, state in self.vehicles_state.items():
+                if state is not None:
+                    self._index(vid, state["pos"] + state["speed"] * (now - state["since"]))
+        # key <= position now <= hi, and position at the deadline (<= key + drift) >= lo;
+        # SLACK absorbs rounding in keys recomputed from trajectories (_schedule decides exactly)
+        lo = msg["pos"] - self.v2v_range - self.max_speed * (msg["time"] + self.ttl - self.indexed_at) - SLACK
+        hi = msg["pos"] + self.v2v_range + SLACK
+        found = []
+        for c in range(int(lo // self.cell_size), int(hi // self.cell_size) + 1):
+            for vid in self.cells.get(c, ()):
+                if lo <= self.keys[vid] <= hi:
+                    found.append(vid)
+        found.sort()
+        return found
+
+    def set_trajectory(self, vid, pos, speed):
+        now = self.env.now
+        self.vehicles_state[vid] = {"pos": pos, "speed": speed, "since": now}
+        if not self.enabled:
+            return
+        self._index(vid, pos)
+        self.version[vid] = self.version.get(vid, 0) + 1
+        heard = self.heard.setdefault(vid, {})
+        for key in [k for k, t in heard.items() if t < now - self.ttl]:
+            del heard[key]
+
+        # Only messages this trajectory can reach before they expire
+        self.channel.expire(now)
+        half = speed * self.ttl / 2
+        for msg in self.channel.nearby(pos + half, self.v2v_range + half):
+            self._schedule(vid, msg)
+
+    def _schedule(self, vid, msg):
+        state = self.vehicles_state.get(vid)
+        if state is None or vid == msg["from"] or self._key(msg) in self.heard.get(vid, ()):
+            return
+        now = self.env.now
+        x = state["pos"] + state["speed"] * (now - state["since"])
+        lo, hi = msg["pos"] - self.v2v_range, msg["pos"] + self.v2v_range
+        deadline = msg["time"] + self.ttl
+        if state["speed"] == 0:
+            if not lo <= x <= hi:
+                return
+            at = now
+        else:
+            at = max(now, now + (lo - x) / state["speed"])
+            if at > min(deadline, now + (hi - x) / state["speed"]):
+                return
+        version = self.version[vid]
+        ev = self.env.timeout(at - now)
+        ev.callbacks.append(lambda _: self._deliver(vid, msg, version))
+
+    def _deliver(self, vid, msg, version):
+        key = self._key(msg)
+        heard = self.heard.setdefault(vid, {})
+        if self.version.get(vid) != version or key in heard:
+            return
+        heard[key] = msg["time"]
+        status = "free" if msg["wait"] == 0 else f"delayed {msg['wait']}s"
+        self.logger.put({
+            "type": "V2V_RECEIVE", "time": self.env.now, "from": msg["from"],
+            "to": vid, "msg_type": msg["type"], "status": status
+        })
+
+
+def _next_multiple(now, interval):
+    return (math.floor(now / interval + EPS) + 1) * interval
+
+
+# ------------ Vehicle (event-driven mobility) ------------
+def vehicle_event_driven(env, vid, config, rsu_data_for_vehicles, coverage,
+                         wait_log, v2v, mailboxes, vehicles_state, logger, rng=random):
+
+    speed = rng.randint(config["vehicles"]["min_speed"], config["vehicles"]["max_speed"])
+    wait_prob = config["vehicles"]["intersection_wait_prob"]
+    wait_min  = config["vehicles"]["intersection_wait_min"]
+    wait_max  = config["vehicles"]["intersection_wait_max"]
+    sample    = config["vehicles"].get("move_sample_interval")
+    interval  = config["rsus"]["broadcast_interval"]
+    until     = config["simulation_time"]
+    intersections = sorted(config["intersections"]["positions"])
+
+    pos = 0.0
+    total_wait = 0
+    wait_log[vid] = total_wait
+    last_seen_broadcast_seq = {}
+    inside = set()  # RSUs whose range this vehicle is in (entered at their start, left at their end)
+    log_move = logger.wants("VEHICLE_MOVE")
+
+    def receive_broadcasts():
+        for rid in sorted(inside):
+            latest = rsu_data_for_vehicles[rid]["broadcasts"].newer_than(last_seen_broadcast_seq.get(rid, -1))
+            if latest is not None:
+                if logger.wants("GLOBAL_RSU_BROADCAST_RECEIVE"):
+                    logger.put({
+                        "type": "GLOBAL_RSU_BROADCAST_RECEIVE", "time": env.now, "to_vid": vid,
+                        "from_rid": rid, "broadcast_time": latest["time"], "avg_wait": latest["avg_wait"]
+                    })
+                mailboxes.send_ack(rid, {
+                    "type": "ACK", "from_vid": vid, "time": env.now, "to_rid": rid,
+                    "seq": latest["seq"]
+                })
+                last_seen_broadcast_seq[rid] = latest["seq"]
+
+    def set_inside(rid, now_inside):
+        # Per-RSU enter/leave: V2R HELLO/BYE, and the RSU's member set in the coverage index
+        if now_inside:
+            inside.add(rid)
+            coverage.enter(vid, rid)
+        else:
+            inside.discard(rid)
+            coverage.leave(vid, rid)
+        event, msg_type = ("RSU_ENTER", "HELLO") if now_inside else ("RSU_LEAVE", "BYE")
+        if logger.wants(event):
+            logger.put({"type": event, "time": env.now, "vid": vid, "pos": pos, "rid": rid})
+        mailboxes.send_v2r(rid, {"type": msg_type, "from": vid, "time": env.now, "pos": pos,
+                                 "wait": total_wait, "to_rid": rid})
+
+    v2v.set_trajectory(vid, pos, speed)
+    for rid in coverage.covering(pos):
+        if coverage.sites[rid]["position"] + coverage.sites[rid]["range"] > pos:
+            set_inside(rid, True)
+    receive_broadcasts()
+
+    while env.now < until:
+        # Candidate instants at which something can change: (time, kind, payload)
+        candidates = [(until, "end", None)]
+        if speed > 0:  # A vehicle with speed 0 (min_speed: 0) never reaches the next intersection or edge
+            nxt = next((x for x in intersections if x > pos), None)
+            if nxt is not None:
+                candidates.append((env.now + (nxt - pos) / speed, "intersection", nxt))
+            edge = coverage.next_edge(pos)
+            if edge is not None:
+                candidates.append((env.now + (edge - pos) / speed, "edge", edge))
+        if inside:
+            candidates.append((_next_multiple(env.now, interval), "broadcast", None))
+        if sample and log_move:
+            candidates.append((_next_multiple(env.now, sample), "sample", None))
+
+        at = min(c[0] for c in candidates)
+        if at >= until:
+            break
+        due = {kind: payload for t, kind, payload in candidates if t <= at + EPS}
+
+        t_prev = env.now
+        yield env.timeout(at - t_prev)
+        pos += speed * (env.now - t_prev)
+        if "intersection" in due:
+            pos = float(due["intersection"])
+        if "edge" in due:
+            edge = due["edge"]
+            pos = float(edge)
+            for rid in coverage.ending_at.get(edge, ()):
+                if rid in inside:
+                    set_inside(rid, False)
+            for rid in coverage.starting_at.get(edge, ()):
+                if rid not in inside and coverage.sites[rid]["range"] > 0:
+                    set_inside(rid, True)
+
+        if "broadcast" in due:
+            yield env.timeout(0)  # let RSUs broadcasting at this instant go first
+        if "sample" in due and log_move:
+            logger.put({"type": "VEHICLE_MOVE", "time": env.now, "vid": vid, "pos": pos})
+        receive_broadcasts()
+
+        if "intersection" in due and rng.random() < wait_prob:
+            wait_time = rng.randint(wait_min, wait_max)
+            if logger.wants("VEHICLE_WAIT_START"):
+                logger.put({
+                    "type": "VEHICLE_WAIT_START", "time": env.now, "vid": vid,
+                    "pos": pos, "wait_time": wait_time
+                })
+            v2v.set_trajectory(vid, pos, 0)
+            v2v.post({"type": "WAIT_START", "from": vid, "time": env.now, "pos": pos, "wait": total_wait + wait_time})
+            for rid in sorted(inside):
+                mailboxes.send_v2r(rid, {
+                    "type": "WAIT_UPDATE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait + wait_time
+                })
+            total_wait += wait_time
+            wait_log[vid] = total_wait
+            yield env.timeout(wait_time)
+            v2v.post({"type": "WAIT_END", "from": vid, "time": env.now, "pos": pos, "wait": total_wait})
+            for rid in sorted(inside):
+                mailboxes.send_v2r(rid, {
+                    "type": "WAIT_UPDATE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait
+                })
+            v2v.set_trajectory(vid, pos, speed)
+            # One move event on resume so consumers see the vehicle is no longer waiting
+            if log_move:
+                logger.put({"type": "VEHICLE_MOVE", "time": env.now, "vid": vid, "pos": pos})
+            receive_broadcasts()
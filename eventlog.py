@@ -0,0 +1,220 @@
+import json
+import numbers
+from pathlib import Path
+
+import numpy as np
+
+# ------------ Binary event log (memory-mapped, seekable) ------------
+# A log is a directory holding:
+#   events.bin  fixed-size records (RECORD), one per event, in time order
+#   extra.bin   JSON for the fields that have no column (e.g. connected_vids)
+#   meta.json   interned type and string tables, record count, sparse time index
+#
+# Per event type, FIELDS maps event keys onto the generic record columns: a/b
+# hold ids and counts, x/y numbers, s1/s2 interned strings. "mask" records
+# which columns (and "time") are actually present, so replay rebuilds the same
+# dict keys. Every event costs a 56-byte record instead of a Python dict.
+
+RECORD = np.dtype([
+    ("time", "<f8"), ("type", "<u2"), ("mask", "<u2"),
+    ("a", "<i4"), ("b", "<i4"), ("x", "<f8"), ("y", "<f8"),
+    ("s1", "<u4"), ("s2", "<u4"), ("extra_off", "<u8"), ("extra_len", "<u4"),
+])
+
+COLUMNS = ("time", "a", "b", "x", "y", "s1", "s2")
+BIT = {col: 1 << i for i, col in enumerate(COLUMNS)}
+
+FIELDS = {
+    "VEHICLE_MOVE": {"vid": "a", "pos": "x"},
+    "VEHICLE_WAIT_START": {"vid": "a", "wait_time": "b", "pos": "x"},
+    "V2V_RECEIVE": {"to": "a", "from": "b", "msg_type": "s1", "status": "s2"},
+    "RSU_ENTER": {"vid": "a", "rid": "b", "pos": "x"},
+    "RSU_LEAVE": {"vid": "a", "rid": "b", "pos": "x"},
+    "RSU_ARRIVED": {"vid": "a", "rid": "b"},
+    "RSU_DEPARTED": {"vid": "a", "rid": "b"},
+    "GLOBAL_RSU_BROADCAST_RECEIVE": {"to_vid": "a", "from_rid": "b", "broadcast_time": "x", "avg_wait": "y"},
+    "RSU_GLOBAL_BROADCAST": {"connected_count": "a", "from": "b", "avg_wait": "y", "broadcast_id": "s1"},
+    "RSU_ACK_RECEIVED": {"from_vid": "a", "rid": "b", "broadcast_id": "s1"},
+    "RSU_BROADCAST_ACK_SUMMARY": {"ack_count": "a", "rid": "b", "broadcast_id": "s1"},
+    "RSU_V2R_MESSAGE_OUT_OF_RANGE": {"from_vid": "a", "rid": "b", "msg_type": "s1"},
+}
+
+INDEX_STRIDE = 4096  # one sparse time-index entry per this many records
+
+
+def _fits(col, value):
+    if isinstance(value, bool):
+        return False
+    if col in ("a", "b"):
+        return isinstance(value, numbers.Integral) and -2**31 <= value < 2**31
+    if col in ("x", "y"):
+        return isinstance(value, numbers.Real)
+    return isinstance(value, str)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class EventLogWriter:
+    """Event sink (anything with put()) that appends events to a binary log.
+
+    Pass it to main() in place of the log queue; with `forward` set, every
+    event is also passed on to that queue, so a live run can be recorded.
+    """
+
+    def __init__(self, path, forward=None, flush_every=65536):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.forward = forward
+        self.flush_every = flush_every
+        self._events = open(self.path / "events.bin", "wb")
+        self._extra = open(self.path / "extra.bin", "wb")
+        self._extra_off = 0
+        self._rows = []
+        self._types, self._strings = {}, {}
+        self._count = 0
+        self._last_time = 0.0
+        self._index = []
+
+    def _intern(self, table, s):
+        i = table.get(s)
+        if i is None:
+            i = table[s] = len(table)
+        return i
+
+    def put(self, event):
+        fields = FIELDS.get(event.get("type"), {})
+        row = dict.fromkeys(RECORD.names, 0)
+        row["type"] = self._intern(self._types, event.get("type", "Unknown"))
+        mask = 0
+        extra = {}
+        for key, value in event.items():
+            if key == "type":
+                continue
+            if key == "time" and isinstance(value, numbers.Real):
+                col = "time"
+            else:
+                col = fields.get(key)
+                if col is None or not _fits(col, value):
+                    extra[key] = value
+                    continue
+            row[col] = self._intern(self._strings, value) if col in ("s1", "s2") else value
+            mask |= BIT[col]
+        # Events without a time (SIM_END) stay at the last time, keeping the time column sorted
+        if mask & BIT["time"]:
+            self._last_time = float(row["time"])
+        row["time"] = self._last_time
+        row["mask"] = mask
+        if extra:
+            blob = json.dumps(extra, default=_json_default).encode()
+            row["extra_off"], row["extra_len"] = self._extra_off, len(blob)
+            self._extra.write(blob)
+            self._extra_off += len(blob)
+
+        if self._count % INDEX_STRIDE == 0:
+            self._index.append(self._last_time)
+        self._rows.append(tuple(row[name] for name in RECORD.names))
+        self._count += 1
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+        if self.forward is not None:
+            self.forward.put(event)
+
+    def flush(self):
+        if self._rows:
+            np.array(self._rows, dtype=RECORD).tofile(self._events)
+            self._rows = []
+        self._events.flush()
+        self._extra.flush()
+
+    def close(self):
+        self.flush()
+        self._events.close()
+        self._extra.close()
+        meta = {
+            "version": 1,
+            "count": self._count,
+            "types": list(self._types),
+            "strings": list(self._strings),
+            "index_stride": INDEX_STRIDE,
+            "index": self._index,
+        }
+        with open(self.path / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventLogReader:
+    """Memory-mapped view of a log written by EventLogWriter."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            meta = json.load(f)
+        self.types = meta["types"]
+        self.strings = meta["strings"]
+        self.stride = meta["index_stride"]
+        self.index = np.asarray(meta["index"], dtype=float)
+        count = meta["count"]
+        if count:
+            self.records = np.memmap(self.path / "events.bin", dtype=RECORD, mode="r", shape=(count,))
+            self.extra = np.memmap(self.path / "extra.bin", dtype=np.uint8, mode="r") \
+                if (self.path / "extra.bin").stat().st_size else None
+        else:
+            self.records, self.extra = np.empty(0, dtype=RECORD), None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def end_time(self):
+        return float(self.records["time"][-1]) if len(self.records) else 0.0
+
+    def _search(self, t, side):
+        # Sparse index picks the block, then a binary search within that block only
+        block = np.searchsorted(self.index, t, side=side)
+        lo = max(0, (block - 1) * self.stride)
+        hi = min(len(self.records), block * self.stride)
+        return lo + int(np.searchsorted(self.records["time"][lo:hi], t, side=side))
+
+    def index_at(self, t):
+        """Index of the first event at or after time t."""
+        return self._search(t, "left")
+
+    def index_after(self, t):
+        """Index of the first event strictly after time t."""
+        return self._search(t, "right")
+
+    def event(self, i):
+        rec = self.records[i]
+        etype = self.types[rec["type"]]
+        mask = int(rec["mask"])
+        event = {"type": etype}
+        if mask & BIT["time"]:
+            event["time"] = float(rec["time"])
+        for key, col in FIELDS.get(etype, {}).items():
+            if mask & BIT[col]:
+                value = rec[col]
+                if col in ("a", "b"):
+                    event[key] = int(value)
+                elif col in ("x", "y"):
+                    event[key] = float(value)
+                else:
+                    event[key] = self.strings[value]
+        if rec["extra_len"]:
+            off = int(rec["extra_off"])
+            event.update(json.loads(bytes(self.extra[off:off + int(rec["extra_len"])])))
+        return event
+
+    def events(self, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        for i in range(start, stop):
+            yield self.event(i)
@@ -0,0 +1,64 @@
+# ------------ Event Logger (subscriptions and verbosity levels) ------------
+# vehicle() and rsu() log through an EventLogger instead of a raw queue.
+# Consumers subscribe to the event types they want; producers check
+# logger.wants(type) before building an event, so unwanted per-step events
+# (VEHICLE_MOVE, V2V_RECEIVE, ...) are never allocated or queued at all.
+
+SUMMARY_EVENTS = frozenset({"SIM_END", "FATAL_ERROR"})
+PER_STEP_EVENTS = frozenset({"VEHICLE_MOVE", "V2V_RECEIVE"})
+
+class _NotIn:
+    """Type filter that matches everything except the given types."""
+    def __init__(self, excluded):
+        self.excluded = excluded
+
+    def __contains__(self, event_type):
+        return event_type not in self.excluded
+
+def _level(name):
+    # "summary": end-of-run results only; "normal": everything but per-step events;
+    # "verbose": everything (None means no filter)
+    if name == "summary":
+        return SUMMARY_EVENTS
+    if name == "verbose":
+        return None
+    if name == "normal":
+        return _NotIn(PER_STEP_EVENTS)
+    raise ValueError(f"Unknown verbosity level: {name!r}")
+
+class EventLogger:
+    """Delivers simulation events to subscribed sinks (queues or anything with put()).
+
+    `types` is an iterable of event types, a verbosity level name ("summary",
+    "normal", "verbose") or None for every event. Subscriptions should be made
+    before the run starts: processes may cache wants() for their lifetime.
+    """
+    def __init__(self, sink=None, types=None):
+        self._subscribers = []
+        if sink is not None:
+            self.subscribe(sink, types)
+
+    def subscribe(self, sink, types=None):
+        if isinstance(types, str):
+            types = _level(types)
+        elif types is not None and not isinstance(types, _NotIn):
+            types = frozenset(types)
+        self._subscribers.append((sink, types))
+
+    def wants(self, event_type):
+        for _, types in self._subscribers:
+            if types is None or event_type in types:
+                return True
+        return False
+
+    def put(self, event):
+        event_type = event.get("type")
+        for sink, types in self._subscribers:
+            if types is None or event_type in types:
+                sink.put(event)
+
+    def wrapped(self, wrap):
+        """Copy of this logger with every sink replaced by wrap(sink), same subscriptions."""
+        logger = EventLogger()
+        logger._subscribers = [(wrap(sink), types) for sink, types in self._subscribers]
+        return logger
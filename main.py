@@ -1,18 +1,25 @@
 import simpy
 import yaml
 import random
+import sys
 from pathlib import Path
-from statistics import mean
-import queue
+
+from events import EventLogger
+from profiling import PhaseProfiler, TimedSink, clock, profile_sampler
+from rsuround import rsu_round
+from simstate import RsuState, SimState, VehicleState
+from statetable import state_publisher
 
 # ------------ Config (Now returns None on failure) ------------
+DEFAULT_CONFIG = Path(__file__).resolve().parent / "scenario_simple.yaml"
+
 def load_config(path=None):
     if path is None:
-        path = Path(__file__).resolve().parent.parent / "config" / "scenario_simple.yaml"
+        path = DEFAULT_CONFIG
     
     try:
         with open(path, "r") as f:
-            print(f"Loading configuration from: {path}")
+            print(f"Loading configuration from: {path}", file=sys.stderr) # stdout stays free for results
             return yaml.safe_load(f)
     except FileNotFoundError:
         # Instead of exiting, we return the error information
@@ -23,152 +30,138 @@ def load_config(path=None):
         }
         return error_info
 
-# ------------ Helper Functions ------------
-def in_rsu_zone(pos, rsu_start, rsu_range):
-    return rsu_start <= pos <= rsu_start + rsu_range
-
-def prune_messages(msgs, now, ttl):
-    cutoff = now - ttl
-    i = 0
-    while i < len(msgs):
-        if msgs[i]["time"] < cutoff:
-            msgs.pop(i)
-        else:
-            i += 1
-
 # ------------ Vehicle (AODV-style reactive V2V) ------------
-def vehicle(env, vid, config, rsu_data_for_vehicles, # Changed this to pass RSU-specific data
-            wait_log, v2v_messages, v2r_inbox, vehicles_state, log_queue,
-            rsu_ack_inbox): # Removed rsu_broadcast_channel here
+def vehicle(env, vid, config, rsu_data_for_vehicles, coverage, # RSU data by id, and the index of who covers where
+            wait_log, v2v_channel, mailboxes, vehicles_state, logger,
+            rng=random, profiler=None, state=None): # state: the VehicleState to start or resume from
     
-    speed = random.randint(config["vehicles"]["min_speed"], config["vehicles"]["max_speed"])
+    state = state if state is not None else VehicleState()
+    if state.speed is None:
+        state.speed = rng.randint(config["vehicles"]["min_speed"], config["vehicles"]["max_speed"])
+    speed = state.speed
     v2v_range = config["vehicles"]["v2v_range"]
-    v2v_ttl   = config["vehicles"].get("v2v_message_ttl", 5)
     wait_prob = config["vehicles"]["intersection_wait_prob"]
     wait_min  = config["vehicles"]["intersection_wait_min"]
     wait_max  = config["vehicles"]["intersection_wait_max"]
     intersections = sorted(config["intersections"]["positions"])
     global_rsu_check_interval = config["vehicles"].get("global_rsu_check_interval", config["time_step"])
 
-    pos = 0.0
-    total_wait = 0
+    pos = state.pos
+    total_wait = state.total_wait
+    wait_log[vid] = total_wait # Kept current, the run usually stops before this process returns
+
+    # Per-step events are only built if someone subscribed to them
+    log_move = logger.wants("VEHICLE_MOVE")
+    log_v2v  = logger.wants("V2V_RECEIVE")
+    prof = profiler # Phase timing (see profiling.py); None costs one test per phase
     
-    # NEW: Store last processed broadcast time per RSU for this vehicle
-    last_processed_rsu_broadcast_time = {} 
+    # NEW: Store the last broadcast seq seen per RSU for this vehicle
+    last_seen_broadcast_seq = state.last_seen 
+    inside_rsus = state.inside # RSUs whose direct V2R range this vehicle is in (per-RSU enter/leave state)
+
+    if state.wake_at is not None: # Resumed from a checkpoint: sleep out the rest of the step or wait
+        yield env.timeout(state.wake_at - env.now)
     
     while env.now < config["simulation_time"]:
-        # Determine RSU range for the RSU this vehicle might be interacting with
-        # This assumes a single RSU or that all RSUs have the same range for global broadcast logic
-        # For multiple RSUs, this would need to iterate through rsu_data_for_vehicles
-        # Here we simplify, assuming rsu_data_for_vehicles contains info for the relevant RSU
-        rsu_start_pos = rsu_data_for_vehicles[0]["position"] # Assuming rsu_data_for_vehicles is a list, get first RSU's info
-        rsu_coverage_range = rsu_data_for_vehicles[0]["range"] # Assuming rsu_data_for_vehicles is a list, get first RSU's info
-
-        inside_rsu_broadcast_range = in_rsu_zone(pos, rsu_start_pos, rsu_coverage_range)
-        
         next_pos = pos + speed
         crossing = None
-        for x in intersections:
-            if pos < x <= next_pos:
-                crossing = x
-                break
+        if state.waiting_under is None:
+            for x in intersections:
+                if pos < x <= next_pos:
+                    crossing = x
+                    break
 
         if crossing is not None:
             pos = float(crossing)
-            vehicles_state[vid] = {"pos": pos, "speed": 0}
+            waiting_under = coverage.place(vid, pos) # RSUs in direct V2R range of the intersection
+            vehicles_state.set(vid, pos, 0, waiting_under)
 
-            if random.random() < wait_prob:
-                wait_time = random.randint(wait_min, wait_max)
-                log_queue.put({
-                    "type": "VEHICLE_WAIT_START", "time": env.now, "vid": vid, 
-                    "pos": pos, "wait_time": wait_time
-                })
-                v2v_messages.append({
+            if rng.random() < wait_prob:
+                wait_time = rng.randint(wait_min, wait_max)
+                if logger.wants("VEHICLE_WAIT_START"):
+                    logger.put({
+                        "type": "VEHICLE_WAIT_START", "time": env.now, "vid": vid, 
+                        "pos": pos, "wait_time": wait_time
+                    })
+                v2v_channel.append({
                     "type": "WAIT_START", "from": vid, "time": env.now, "pos": pos, "wait": total_wait + wait_time
                 })
-                # Check if in RSU's direct V2R range (usually smaller than global broadcast range)
-                if in_rsu_zone(pos, rsu_start_pos, rsu_data_for_vehicles[0]["range"]): # Using RSU's specific V2R range
-                    v2r_inbox.append({
+                # Every RSU whose direct V2R range covers the intersection gets the update
+                for rid in waiting_under:
+                    mailboxes.send_v2r(rid, {
                         "type": "WAIT_UPDATE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait + wait_time
                     })
                 total_wait += wait_time
+                wait_log[vid] = total_wait
+                state.pos, state.total_wait, state.waiting_under = pos, total_wait, waiting_under
+                state.wake_at, state.wake_seq = env.now + wait_time, state.wakes()
                 yield env.timeout(wait_time)
-                v2v_messages.append({
-                    "type": "WAIT_END", "from": vid, "time": env.now, "pos": pos, "wait": total_wait
+        if state.waiting_under is not None:
+            v2v_channel.append({
+                "type": "WAIT_END", "from": vid, "time": env.now, "pos": pos, "wait": total_wait
+            })
+            for rid in state.waiting_under:
+                mailboxes.send_v2r(rid, {
+                    "type": "WAIT_UPDATE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait
                 })
-                # Check if in RSU's direct V2R range
-                if in_rsu_zone(pos, rsu_start_pos, rsu_data_for_vehicles[0]["range"]): # Using RSU's specific V2R range
-                    v2r_inbox.append({
-                        "type": "WAIT_UPDATE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait
-                    })
+            state.waiting_under = None
+        if prof: t0 = clock()
         pos += speed
-        vehicles_state[vid] = {"pos": pos, "speed": speed}
-        log_queue.put({"type": "VEHICLE_MOVE", "time": env.now, "vid": vid, "pos": pos})
+        covering = coverage.place(vid, pos) # Kept in step with vehicles_state: rsu() reads its members
+        vehicles_state.set(vid, pos, speed, covering)
+        if log_move:
+            logger.put({"type": "VEHICLE_MOVE", "time": env.now, "vid": vid, "pos": pos})
         
-        prune_messages(v2v_messages, env.now, v2v_ttl) # Prune V2V messages
+        expired = v2v_channel.expire(env.now) # Expire old V2V messages (once per time instant)
+        if prof: prof.add("vehicle.move", clock() - t0, expired=expired)
         
-        # V2V Receive Logic
-        for m in v2v_messages:
-            if m["from"] == vid:
-                continue
-            if abs(pos - m["pos"]) <= v2v_range:
+        # V2V Receive Logic (only the cells around this vehicle are scanned)
+        # Receiving only produces V2V_RECEIVE events, so it is skipped when nobody listens
+        if log_v2v:
+            if prof: t0 = clock()
+            scanned = delivered = 0
+            for m in v2v_channel.nearby(pos, v2v_range):
+                scanned += 1
+                if m["from"] == vid:
+                    continue
                 status = "free" if m["wait"] == 0 else f"delayed {m['wait']}s"
-                log_queue.put({
+                logger.put({
                     "type": "V2V_RECEIVE", "time": env.now, "from": m["from"], 
                     "to": vid, "msg_type": m["type"], "status": status
                 })
+                delivered += 1
+            if prof: prof.add("vehicle.v2v_receive", clock() - t0, scanned=scanned, delivered=delivered)
         
-        # RSU Zone Entry/Exit (V2R - direct communication with RSU)
-        # This `inside_rsu` flag refers to the direct RSU communication range, not the wider broadcast range
-        # We need a per-RSU 'inside' status if there are multiple RSUs
-        # For simplicity, and current single RSU, this still works for direct V2R
-        is_in_direct_rsu_zone = in_rsu_zone(pos, rsu_start_pos, rsu_data_for_vehicles[0]["range"]) # Direct RSU range
-        
-        # This part of the vehicle logic deals with *direct* V2R messages, not global broadcasts
-        # The 'inside_rsu' logic is specific to direct V2R, which has its own range
-        # The 'inside_rsu' state needs to be maintained per RSU if there are multiple RSUs.
-        # For a single RSU, it simplifies. Let's make it consistent.
-        if not hasattr(env, 'vehicle_direct_rsu_status'):
-            env.vehicle_direct_rsu_status = {}
-        
-        if vid not in env.vehicle_direct_rsu_status:
-             env.vehicle_direct_rsu_status[vid] = False # Not inside any RSU direct range initially
-
-        if is_in_direct_rsu_zone and not env.vehicle_direct_rsu_status[vid]:
-            env.vehicle_direct_rsu_status[vid] = True
-            log_queue.put({"type": "RSU_ENTER", "time": env.now, "vid": vid, "pos": pos, "rid": rsu_data_for_vehicles[0]["id"]})
-            v2r_inbox.append({"type": "HELLO", "from": vid, "time": env.now, "pos": pos, "wait": total_wait, "to_rid": rsu_data_for_vehicles[0]["id"]})
-        elif not is_in_direct_rsu_zone and env.vehicle_direct_rsu_status[vid]:
-            env.vehicle_direct_rsu_status[vid] = False
-            log_queue.put({"type": "RSU_LEAVE", "time": env.now, "vid": vid, "pos": pos, "rid": rsu_data_for_vehicles[0]["id"]})
-            v2r_inbox.append({"type": "BYE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait, "to_rid": rsu_data_for_vehicles[0]["id"]})
+        # RSU Zone Entry/Exit (V2R - direct communication with each RSU)
+        # Per-RSU state: leaving every RSU that no longer covers us, then entering the new ones
+        if prof: t0 = clock()
+        if covering != inside_rsus:
+            for rid in inside_rsus:
+                if rid not in covering:
+                    if logger.wants("RSU_LEAVE"):
+                        logger.put({"type": "RSU_LEAVE", "time": env.now, "vid": vid, "pos": pos, "rid": rid})
+                    mailboxes.send_v2r(rid, {"type": "BYE", "from": vid, "time": env.now, "pos": pos, "wait": total_wait, "to_rid": rid})
+            for rid in covering:
+                if rid not in inside_rsus:
+                    if logger.wants("RSU_ENTER"):
+                        logger.put({"type": "RSU_ENTER", "time": env.now, "vid": vid, "pos": pos, "rid": rid})
+                    mailboxes.send_v2r(rid, {"type": "HELLO", "from": vid, "time": env.now, "pos": pos, "wait": total_wait, "to_rid": rid})
+            inside_rsus = covering
+        if prof:
+            prof.add("vehicle.rsu_zone", clock() - t0)
+            t0 = clock()
+            checked = received = 0
         
         # --- NEW: Vehicle listens for RSU Broadcasts if it's within the RSU's broadcast range ---
-        # Iterate through available RSU broadcast data.
-        for rsu_info in rsu_data_for_vehicles:
-            rid = rsu_info["id"]
-            rsu_broadcast_channel = rsu_info["broadcast_channel"] # Get specific RSU's broadcast channel
-            rsu_broadcast_range = rsu_info["range"] # Get specific RSU's range
-            rsu_pos = rsu_info["position"]
-
-            # Check if vehicle is within *this RSU's* broadcast range
-            if in_rsu_zone(pos, rsu_pos, rsu_broadcast_range):
-                # Only check for new broadcasts from this specific RSU
-                last_processed_time = last_processed_rsu_broadcast_time.get(rid, -1)
-                
-                latest_new_broadcast = None
-                for i in range(len(rsu_broadcast_channel) - 1, -1, -1):
-                    broadcast_msg = rsu_broadcast_channel[i]
-                    # Ensure it's from the correct RSU and it's newer than what we last processed
-                    if broadcast_msg["from"] == rid and broadcast_msg["time"] > last_processed_time:
-                        if latest_new_broadcast is None or broadcast_msg["time"] > latest_new_broadcast["time"]:
-                            latest_new_broadcast = broadcast_msg
-                    # If we hit an older broadcast from this RSU, we can stop for this RSU's channel
-                    elif broadcast_msg["from"] == rid and broadcast_msg["time"] <= last_processed_time:
-                        break
-                
-                if latest_new_broadcast:
-                    log_queue.put({
+        # Only the RSUs covering this position (from the coverage index) are checked, and
+        # each in O(1): its register holds the latest broadcast and its sequence number
+        for rid in covering:
+            if prof: checked += 1
+            latest_new_broadcast = rsu_data_for_vehicles[rid]["broadcasts"].newer_than(last_seen_broadcast_seq.get(rid, -1))
+            
+            if latest_new_broadcast:
+                if logger.wants("GLOBAL_RSU_BROADCAST_RECEIVE"):
+                    logger.put({
                         "type": "GLOBAL_RSU_BROADCAST_RECEIVE", 
                         "time": env.now, 
                         "to_vid": vid, 
@@ -176,171 +169,156 @@ def vehicle(env, vid, config, rsu_data_for_vehicles, # Changed this to pass RSU-
                         "broadcast_time": latest_new_broadcast["time"],
                         "avg_wait": latest_new_broadcast["avg_wait"]
                     })
-                    
-                    # Send an acknowledgment back to the RSU
-                    rsu_ack_inbox.append({
-                        "type": "ACK", 
-                        "from_vid": vid, 
-                        "time": env.now, 
-                        "to_rid": latest_new_broadcast["from"],
-                        "broadcast_id": latest_new_broadcast["broadcast_id"] 
-                    })
-                    
-                    # Update last processed time for this RSU for this vehicle
-                    last_processed_rsu_broadcast_time[rid] = latest_new_broadcast["time"]
+                
+                # Send an acknowledgment back to the RSU
+                mailboxes.send_ack(latest_new_broadcast["from"], {
+                    "type": "ACK", 
+                    "from_vid": vid, 
+                    "time": env.now, 
+                    "to_rid": latest_new_broadcast["from"],
+                    "seq": latest_new_broadcast["seq"] 
+                })
+                
+                # Update the last seen broadcast for this RSU for this vehicle
+                last_seen_broadcast_seq[rid] = latest_new_broadcast["seq"]
+                if prof: received += 1
             # -------------------------------------------------------------------
+        if prof: prof.add("vehicle.broadcast_receive", clock() - t0, checked=checked, received=received)
 
+        state.pos, state.total_wait, state.inside = pos, total_wait, inside_rsus
+        state.wake_at, state.wake_seq = env.now + config["time_step"], state.wakes()
         yield env.timeout(config["time_step"]) # Advance simulation by one step
     wait_log[vid] = total_wait
 
 # ------------ RSU (proactive table-driven) ------------
-def rsu(env, rid, config, vehicles_state, v2r_inbox, rsu_log, log_queue,
-        rsu_broadcast_channel, rsu_ack_inbox, rsu_position, rsu_range): # Added rsu_position, rsu_range
+def rsu(env, rid, config, coverage, mailboxes, rsu_log, logger,
+        broadcasts, profiler=None, state=None): # coverage: the CoverageIndex vehicles report to; broadcasts: this RSU's BroadcastRegister
+    prof = profiler
+    state = state if state is not None else RsuState() # What it carries between broadcasts
     
-    coverage  = rsu_range # Use passed in rsu_range
     interval  = config["rsus"]["broadcast_interval"]
-    connected = set()
-    arrival_at = {}
-    table = {}
+
+    if state.wake_at is not None: # Resumed from a checkpoint
+        yield env.timeout(state.wake_at - env.now)
     
     while env.now < config["simulation_time"]:
-        in_range = []
-        # Vehicles directly connected to this RSU via V2R (within its direct coverage)
-        for vid, state in vehicles_state.items():
-            if state is None: 
-                continue
-            # Use the RSU's specific position and range for direct V2R connection
-            if in_rsu_zone(state["pos"], rsu_position, coverage): 
-                in_range.append(vid)
-        
-        new_conn = set(in_range) - connected
-        gone     = connected - set(in_range)
-        
-        for vid in sorted(new_conn):
-            log_queue.put({"type": "RSU_ARRIVED", "time": env.now, "rid": rid, "vid": vid})
-            connected.add(vid)
-            arrival_at[vid] = env.now
-            table.setdefault(vid, {})
-            table[vid]["first_seen"] = env.now
-            table[vid]["last_seen"]  = env.now
-        
-        for vid in sorted(gone):
-            log_queue.put({"type": "RSU_DEPARTED", "time": env.now, "rid": rid, "vid": vid})
-            connected.remove(vid)
-            rsu_log.append({"vehicle": vid, "arrival": arrival_at.get(vid, None), "departure": env.now})
-            table.setdefault(vid, {})
-            table[vid]["last_seen"] = env.now
-        
-        # Process V2R Inbox messages (range-based messages from vehicles to this RSU)
-        # Filter for messages intended for *this specific RSU*
-        i = 0
-        while i < len(v2r_inbox):
-            m = v2r_inbox[i]
-            if m.get("to_rid") == rid: # Only process messages for this RSU
-                vid = m["from"]
-                if vid in connected: # Only process messages from currently connected vehicles for V2R inbox
-                    rec = table.setdefault(vid, {})
-                    rec["last_pos"]   = m["pos"]
-                    rec["last_wait"]  = m.get("wait", rec.get("last_wait", 0))
-                    rec["last_update"]= m["time"]
-                    v2r_inbox.pop(i)
-                else: # Message for this RSU, but vehicle no longer connected (can happen if vehicle just left)
-                    log_queue.put({"type": "RSU_V2R_MESSAGE_OUT_OF_RANGE", "time": env.now, "rid": rid, "from_vid": vid, "msg_type": m["type"]})
-                    v2r_inbox.pop(i) # Remove it anyway, RSU can't process it.
-            else:
-                i += 1
+        if prof: t0 = clock()
+        # Vehicles directly connected to this RSU via V2R (within its direct coverage),
+        # as the vehicles keep them in the coverage index: no sweep over every vehicle
+        in_range = coverage.members(rid)
+        if prof: prof.add("rsu.coverage", clock() - t0, in_range=len(in_range))
         
-        connected_list = sorted(list(connected))
-        waits = [table[v].get("last_wait", 0) for v in connected_list if v in table]
-        avg_wait = mean(waits) if waits else 0
-
-        # --- NEW: RSU places broadcast into its specific global channel ---
-        broadcast_id = f"RSU{rid}_BCAST_{int(env.now)}" 
-        rsu_broadcast_msg = {
-            "type": "RSU_GLOBAL_BROADCAST", 
-            "from": rid, 
-            "time": env.now, 
-            "broadcast_id": broadcast_id,
-            "connected_count": len(connected_list), 
-            "avg_wait": avg_wait,
-            "connected_vids": connected_list
-        }
-        # Append to the *specific* RSU's broadcast channel
-        rsu_broadcast_channel.append(rsu_broadcast_msg) 
-
-        log_queue.put(rsu_broadcast_msg) 
-
-        # --- NEW: RSU processes global acknowledgments (ACKs) ---
-        acknowledged_by = set()
-        i = 0
-        while i < len(rsu_ack_inbox):
-            ack_msg = rsu_ack_inbox[i]
-            # Check if ACK is for this RSU and matches the current broadcast ID
-            if ack_msg["to_rid"] == rid and ack_msg["broadcast_id"] == broadcast_id:
-                acknowledged_by.add(ack_msg["from_vid"])
-                log_queue.put({
-                    "type": "RSU_ACK_RECEIVED", 
-                    "time": env.now, 
-                    "rid": rid, 
-                    "from_vid": ack_msg["from_vid"],
-                    "broadcast_id": ack_msg["broadcast_id"]
-                })
-                rsu_ack_inbox.pop(i) 
-            else:
-                i += 1
-        
-        if acknowledged_by:
-            log_queue.put({
-                "type": "RSU_BROADCAST_ACK_SUMMARY",
-                "time": env.now,
-                "rid": rid,
-                "broadcast_id": broadcast_id,
-                "ack_count": len(acknowledged_by),
-                "acknowledged_vids": sorted(list(acknowledged_by))
-            })
+        # Arrivals/departures, V2R inbox, broadcast and the previous broadcast's ACKs
+        rsu_round(rid, env.now, in_range, state, broadcasts, mailboxes,
+                  logger.put, logger.wants, rsu_log.append, prof)
 
+        state.wake_at, state.wake_seq = env.now + interval, state.wakes()
         yield env.timeout(interval) 
     
+# ------------ Process start-up (fresh or resumed) ------------
+def rsu_data_for_vehicles(sim):
+    # NEW: Prepare RSU data for vehicles, including their specific broadcast channels
+    # RSUs are placed per rsus.sites (or all at rsus.position); the coverage index answers
+    # "which RSUs cover x" for vehicles and "which vehicles are in range" for RSUs
+    return [{
+        "id": site["id"],
+        "position": site["position"],
+        "range": site["range"],
+        "broadcasts": sim.broadcasts[site["id"]] # Reference to this RSU's register
+    } for site in sim.sites]
+
+def start_processes(env, sim, config, logger, profiler=None):
+    # Starts an rsu() per site and a stepped vehicle() per vehicle on the state in `sim`.
+    # A fresh state starts them RSUs first; a restored one (see checkpoint.py) resumes
+    # them in the order they went to sleep, so same-instant wake-ups keep their order.
+    all_rsu_data = rsu_data_for_vehicles(sim)
+    procs = [("rsu", rid, state) for rid, state in enumerate(sim.rsus)]
+    procs += [("vehicle", vid, state) for vid, state in enumerate(sim.vehicles)]
+    if sim.resumed:
+        procs.sort(key=lambda p: (p[2].wake_at, p[2].wake_seq))
+    for kind, i, state in procs:
+        if kind == "rsu":
+            env.process(rsu(env, i, config, sim.coverage, sim.mailboxes, sim.rsu_log, logger,
+                            sim.broadcasts[i], profiler, state)) # Pass specific register
+        else:
+            env.process(vehicle(env, i, config, all_rsu_data, sim.coverage, # Pass list of all RSU data
+                                sim.wait_log, sim.v2v_channel, sim.mailboxes, sim.vehicles_state,
+                                logger, sim.rng, profiler, state))
+
 # ------------ Main (Now handles config failure) ------------
-def main(log_queue):
-    config = load_config()
+def main(log_queue, config=None, seed=None, state_table=None, checkpoint=None, environment=simpy.Environment):
+    # log_queue: a queue (or anything with put()) that gets every event, or an
+    #            EventLogger carrying the consumers' subscriptions
+    # config: an already loaded scenario dict (default: load it from disk)
+    # seed: seeds a private RNG for this run (default: the global `random` module)
+    # state_table: a VehicleStateTable to publish every time_step (simpy engine only)
+    # checkpoint: a checkpoint.Checkpoint to continue from instead of time 0, with
+    #             `config` as the variant's parameters (simpy engine, stepped mobility);
+    #             a seed then reseeds the continuation
+    # environment: the simpy.Environment (sub)class to run in (simpy engine only)
+    logger = log_queue if isinstance(log_queue, EventLogger) else EventLogger(log_queue)
+    if config is None:
+        config = load_config()
     
     if config.get("type") == "FATAL_ERROR":
-        log_queue.put(config) 
+        logger.put(config) 
         return 
 
-    env = simpy.Environment()
-    rsu_log, wait_log, v2v_messages, v2r_inbox = [], {}, [], []
-    rsu_ack_inbox = []        
+    if checkpoint is not None:
+        sim = checkpoint.restore(config, seed) # A private copy: the checkpoint can fork again
+    elif config.get("engine", "simpy") == "vectorized":
+        # Opt-in NumPy engine: all vehicles advanced together, same event schema
+        from vectorized import run_vectorized
+        import numpy as np
+        run_vectorized(config, logger, np.random.default_rng(seed))
+        return
+    elif config.get("engine", "simpy") == "partitioned":
+        # Opt-in multi-process engine: the road split into segments stepped by worker processes
+        from partitioned import run_partitioned
+        run_partitioned(config, logger, seed)
+        return
+    else:
+        sim = SimState(config, random.Random(seed) if seed is not None else random)
+    env = environment(initial_time=sim.time)
 
-    vehicles_state = {i: None for i in range(config["vehicles"]["count"])}
+    # Opt-in hot-path profiling: phase timings for vehicle()/rsu() and timed sink puts
+    profiling = config.get("profiling") or {}
+    profiler = PhaseProfiler() if profiling.get("enabled") else None
+    if profiler:
+        logger = logger.wrapped(lambda sink: TimedSink(sink, profiler))
+        if profiling.get("sample_interval"):
+            env.process(profile_sampler(env, profiler, logger, profiling["sample_interval"]))
 
-    # NEW: Prepare RSU data for vehicles, including their specific broadcast channels
-    all_rsu_data_for_vehicles = []
-    
-    # Each RSU now has its *own* broadcast channel
-    rsu_broadcast_channels = [[] for _ in range(config["rsus"]["count"])]
+    # Stepped vehicles write their state in place (struct of arrays, see statetable.py)
+    if state_table is not None:
+        sim.use_table(state_table)
+    trajectories = None
 
-    for i in range(config["rsus"]["count"]):
-        rsu_id = i
-        rsu_pos = config["rsus"]["position"] # Assuming all RSUs are at the same position for simplicity
-        rsu_range = config["rsus"]["range"]
-        all_rsu_data_for_vehicles.append({
-            "id": rsu_id,
-            "position": rsu_pos,
-            "range": rsu_range,
-            "broadcast_channel": rsu_broadcast_channels[i] # Reference to this RSU's channel
-        })
-        env.process(rsu(env, rsu_id, config, vehicles_state, v2r_inbox, rsu_log, log_queue,
-                        rsu_broadcast_channels[i], rsu_ack_inbox, rsu_pos, rsu_range)) # Pass specific channel and pos/range
+    # Mobility: step every time_step (default) or sleep until the next event that matters
+    if config.get("mobility", "stepped") == "event_driven":
+        from event_driven import V2VDelivery, vehicle_event_driven
+        # Event-driven vehicles publish trajectories; the table is sampled from them
+        trajectories = {i: None for i in range(config["vehicles"]["count"])}
+        v2v = V2VDelivery(env, sim.v2v_channel, trajectories, logger,
+                          config["vehicles"]["v2v_range"], config["vehicles"].get("v2v_message_ttl", 5),
+                          config["vehicles"]["max_speed"])
+        all_rsu_data = rsu_data_for_vehicles(sim)
+        for rid, state in enumerate(sim.rsus):
+            env.process(rsu(env, rid, config, sim.coverage, sim.mailboxes, sim.rsu_log, logger,
+                            sim.broadcasts[rid], profiler, state))
+        # Only the stepped vehicle() is instrumented
+        for i in range(config["vehicles"]["count"]):
+            env.process(vehicle_event_driven(env, i, config, all_rsu_data, sim.coverage,
+                                             sim.wait_log, v2v, sim.mailboxes, trajectories, logger, sim.rng))
+    else:
+        start_processes(env, sim, config, logger, profiler)
 
-    for i in range(config["vehicles"]["count"]):
-        env.process(vehicle(env, i, config, all_rsu_data_for_vehicles, # Pass list of all RSU data
-                            wait_log, v2v_messages, v2r_inbox, vehicles_state, log_queue,
-                            rsu_ack_inbox))
+    if state_table is not None:
+        env.process(state_publisher(env, state_table, config["time_step"], trajectories, sim.coverage))
 
     env.run(until=config["simulation_time"])
-    log_queue.put({"type": "SIM_END", "rsu_log": rsu_log, "wait_log": wait_log})
-
-
-
+    sim_end = {"type": "SIM_END", "rsu_log": sim.rsu_log, "wait_log": sim.wait_log}
+    if profiler:
+        sim_end["profile"] = profiler.report()
+    logger.put(sim_end)
+    return env # The finished environment
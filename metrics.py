@@ -0,0 +1,230 @@
+import bisect
+import csv
+import math
+from collections import Counter
+
+# ------------ Streaming metrics (online aggregates, constant memory) ------------
+# OnlineMetrics is an event sink: subscribe it to the EventLogger next to (or
+# instead of) any other consumer and it folds each event into running
+# aggregates as it arrives, so no event has to be kept for later analysis:
+#
+#   counters        events per type
+#   running stats   count, mean, variance, min and max (Welford's method)
+#   histograms      fixed bucket edges, plus under- and overflow
+#   windowed rates  events per simulated second over the last `window` seconds
+#
+# Every `interval` simulated seconds (and at SIM_END) it appends a snapshot
+# row of scalar metrics; to_csv() / to_parquet() write those rows out.
+#
+#   metrics = OnlineMetrics(interval=10)
+#   main(EventLogger(metrics, OnlineMetrics.TYPES), config, seed)
+#   metrics.to_csv("metrics.csv")
+#
+# Parquet output is optional: it needs pandas and pyarrow
+# (pip install -r requirements-parquet.txt).
+
+
+def check_parquet():
+    """Raises ImportError, saying what to install, when Parquet cannot be written."""
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"Parquet output needs pandas and pyarrow ({e}); "
+                          "pip install -r requirements-parquet.txt, or write a .csv") from e
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of a stream of numbers."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    @property
+    def variance(self):
+        """Population variance (0 until there are two values)."""
+        return self._m2 / self.n if self.n > 1 else 0.0
+
+    def result(self):
+        if not self.n:
+            return {"n": 0}
+        return {"n": self.n, "mean": self.mean, "std": math.sqrt(self.variance),
+                "min": self.min, "max": self.max}
+
+
+class Histogram:
+    """Counts per bucket [edges[i], edges[i+1]), with under- and overflow counts."""
+
+    def __init__(self, edges):
+        self.edges = sorted(edges)
+        self.counts = [0] * (len(self.edges) + 1)   # counts[0]: below edges[0]; counts[-1]: from edges[-1]
+
+    def add(self, x):
+        self.counts[bisect.bisect_right(self.edges, x)] += 1
+
+    def result(self):
+        return {"edges": list(self.edges), "counts": list(self.counts)}
+
+
+class WindowedRate:
+    """Events per second over the last `window` seconds, in `buckets` fixed slices."""
+
+    def __init__(self, window, buckets=10):
+        self.window = window
+        self.width = window / buckets
+        self.counts = [0] * buckets
+        self.current = 0            # index of the newest slice since time 0
+
+    def _advance(self, now):
+        slot = int(now // self.width)
+        # Clear the slices that fell out of the window since the last call
+        for i in range(self.current + 1, min(slot, self.current + len(self.counts)) + 1):
+            self.counts[i % len(self.counts)] = 0
+        self.current = max(self.current, slot)
+
+    def add(self, now, n=1):
+        self._advance(now)
+        self.counts[self.current % len(self.counts)] += n
+
+    def rate(self, now):
+        self._advance(now)
+        return sum(self.counts) / self.window
+
+
+class OnlineMetrics:
+    """Event sink keeping V2V, broadcast/ACK, dwell and wait metrics online."""
+
+    # V2V_RECEIVE is a per-step event: subscribing to it makes vehicles build it
+    TYPES = ("SIM_END", "V2V_RECEIVE", "VEHICLE_WAIT_START", "RSU_ARRIVED", "RSU_DEPARTED",
+             "RSU_GLOBAL_BROADCAST", "GLOBAL_RSU_BROADCAST_RECEIVE", "RSU_ACK_RECEIVED",
+             "RSU_BROADCAST_ACK_SUMMARY")
+
+    DWELL_EDGES = (0, 5, 10, 20, 30, 60, 120, 300, 600)   # seconds
+    WAIT_EDGES = (0, 5, 10, 15, 20, 30, 60)              # seconds
+
+    def __init__(self, interval=10.0, window=10.0):
+        self.interval = interval
+        self.counts = Counter()
+        self.dwell = RunningStats()
+        self.dwell_hist = Histogram(self.DWELL_EDGES)
+        self.wait = RunningStats()
+        self.wait_hist = Histogram(self.WAIT_EDGES)
+        self.ack_ratio = RunningStats()     # per broadcast: ACKs received / vehicles connected (can pass 1)
+        self.avg_wait = RunningStats()      # avg_wait reported by the RSU broadcasts
+        self.v2v_rate = WindowedRate(window)
+        self.ack_rate = WindowedRate(window)
+        self.arrived = {}                   # (rid, vid) -> arrival time, vehicles in range only
+        self.pending = {}                   # (rid, seq) -> connected_count of broadcasts awaiting ACKs
+        self.time = 0.0
+        self.next_snapshot = interval
+        self.rows = []
+
+    def put(self, event):
+        event_type = event["type"]
+        now = event.get("time", self.time)
+        while self.interval and now >= self.next_snapshot:
+            self.snapshot(self.next_snapshot)
+            self.next_snapshot += self.interval
+        self.time = max(self.time, now)
+        self.counts[event_type] += 1
+
+        if event_type == "V2V_RECEIVE":
+            self.v2v_rate.add(now)
+        elif event_type == "VEHICLE_WAIT_START":
+            self.wait.add(event["wait_time"])
+            self.wait_hist.add(event["wait_time"])
+        elif event_type == "RSU_ARRIVED":
+            self.arrived[event["rid"], event["vid"]] = now
+        elif event_type == "RSU_DEPARTED":
+            arrival = self.arrived.pop((event["rid"], event["vid"]), None)
+            if arrival is not None:
+                self.dwell.add(now - arrival)
+                self.dwell_hist.add(now - arrival)
+        elif event_type == "RSU_GLOBAL_BROADCAST":
+            self.avg_wait.add(event["avg_wait"])
+            rid, seq = event["from"], event["seq"]
+            self.pending[rid, seq] = event["connected_count"]
+            # ACKs only ever arrive for the previous broadcast: the one before got none
+            unacked = self.pending.pop((rid, seq - 2), None)
+            if unacked is not None:
+                self._ack_ratio(unacked, 0)
+        elif event_type == "RSU_ACK_RECEIVED":
+            self.ack_rate.add(now)
+        elif event_type == "RSU_BROADCAST_ACK_SUMMARY":
+            # Keyed by seq: broadcast_id strings repeat within a second (broadcast_interval < 1)
+            connected = self.pending.pop((event["rid"], event["seq"]), None)
+            if connected is not None:
+                self._ack_ratio(connected, event["ack_count"])
+        elif event_type == "SIM_END":
+            if self.rows and self.rows[-1]["time"] == self.time:
+                self.rows.pop()   # taken before the rest of that instant's events
+            self.snapshot(self.time)
+
+    def _ack_ratio(self, connected, acks):
+        if connected:
+            self.ack_ratio.add(acks / connected)
+
+    def snapshot(self, now):
+        """Appends (and returns) one row of the current metrics at simulated time `now`."""
+        counts = self.counts
+        acks_sent = counts["GLOBAL_RSU_BROADCAST_RECEIVE"]
+        row = {
+            "time": now,
+            "v2v_received": counts["V2V_RECEIVE"],
+            "v2v_rate": self.v2v_rate.rate(now),
+            "broadcasts": counts["RSU_GLOBAL_BROADCAST"],
+            "acks_sent": acks_sent,
+            "acks_received": counts["RSU_ACK_RECEIVED"],
+            "ack_ratio": counts["RSU_ACK_RECEIVED"] / acks_sent if acks_sent else None,
+            "ack_rate": self.ack_rate.rate(now),
+            "broadcast_ack_ratio_mean": self.ack_ratio.mean if self.ack_ratio.n else None,
+            "broadcast_ack_ratio_std": math.sqrt(self.ack_ratio.variance) if self.ack_ratio.n else None,
+            "in_range": len(self.arrived),
+            "dwell_n": self.dwell.n,
+            "dwell_mean": self.dwell.mean if self.dwell.n else None,
+            "dwell_std": math.sqrt(self.dwell.variance) if self.dwell.n else None,
+            "waits": self.wait.n,
+            "wait_mean": self.wait.mean if self.wait.n else None,
+            "rsu_avg_wait_mean": self.avg_wait.mean if self.avg_wait.n else None,
+        }
+        self.rows.append(row)
+        return row
+
+    def result(self):
+        """Final aggregates, histograms included."""
+        return {
+            "events": dict(self.counts),
+            "broadcast_ack_ratio": self.ack_ratio.result(),
+            "dwell": dict(self.dwell.result(), histogram=self.dwell_hist.result()),
+            "wait": dict(self.wait.result(), histogram=self.wait_hist.result()),
+            "rsu_avg_wait": self.avg_wait.result(),
+        }
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0]) if self.rows else ["time"])
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def to_parquet(self, path):
+        import pandas as pd  # Optional: only needed for Parquet (see check_parquet)
+        pd.DataFrame(self.rows).to_parquet(path, index=False)
+
+    def export(self, path):
+        """Writes the snapshot rows as Parquet for a .parquet path, CSV otherwise."""
+        if str(path).endswith(".parquet"):
+            self.to_parquet(path)
+        else:
+            self.to_csv(path)
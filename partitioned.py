@@ -0,0 +1,621 @@
+import bisect
+import heapq
+import multiprocessing
+import os
+import pickle
+import random
+import time
+import traceback
+from operator import itemgetter
+
+from channels import BroadcastRegister, MessageStore, RsuMailboxes, V2VChannel
+from coverage import CoverageIndex, rsu_sites
+from profiling import PhaseProfiler
+from rsuround import rsu_round
+
+# ------------ Partitioned Engine (road segments in worker processes) ------------
+# Opt-in (`engine: partitioned`): the road is cut into `partitioning.workers`
+# segments and each segment is stepped by its own worker process. Vehicles and
+# RSUs follow the vectorized engine's rules on the time_step grid (RSUs first on
+# a tie). The workers synchronize conservatively at every time_step, where
+#
+#   - a vehicle that moved past its segment's edge is handed to the segment it is in now
+#   - the V2V messages sent within v2v_range of a segment (its halo) are passed to it
+#     before it delivers that step's V2V_RECEIVE events
+#   - every rebalance_every steps the edges may move to even out the vehicle counts
+#
+# Segment edges are kept more than max_speed away from every RSU's range, so an
+# RSU and all the vehicles that can reach it during a step are in one segment.
+# Random draws are keyed by (seed, vid, draw number) rather than taken from one
+# shared stream, and the workers' events are merged in (time, RSUs / vehicles /
+# V2V, id) order, so events, wait_log and rsu_log are the same for any number of
+# workers; `workers: 1` runs the same engine in this process.
+#
+# The per-vehicle draws make this a different random model from the other two
+# engines (one random.Random stream in process order for simpy, one NumPy
+# Generator in array order for vectorized): a seed gives a run with the same
+# distributions but not the same events as either, so compare partitioned
+# results with partitioned results only.
+
+EVENT_TYPES = (
+    "VEHICLE_MOVE", "V2V_RECEIVE", "VEHICLE_WAIT_START", "RSU_ENTER", "RSU_LEAVE",
+    "GLOBAL_RSU_BROADCAST_RECEIVE", "RSU_ARRIVED", "RSU_DEPARTED", "RSU_V2R_MESSAGE_OUT_OF_RANGE",
+    "RSU_GLOBAL_BROADCAST", "RSU_ACK_RECEIVED", "RSU_BROADCAST_ACK_SUMMARY",
+)
+
+# Order of the three phases within one instant (the middle element of event keys)
+RSU_ROUND, VEHICLE_STEP, V2V_RECEIVE = 0, 1, 2
+
+IMBALANCE = 1.2        # rebalance when a segment holds more than this times the mean vehicle count
+GAIN = 1.1             # ... and only if the new edges shrink the fullest segment by this factor
+SAMPLE_POINTS = 1024   # positions per segment the rebalancer places the new edges from
+
+# ------------ Per-vehicle random draws ------------
+# SplitMix64: draw n of a vehicle is a hash of its key plus n, so the outcome
+# does not depend on which worker steps the vehicle or in what order.
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def _mix64(x):
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _draw(v):
+    v.draws += 1
+    return _mix64((v.key + v.draws * _GOLDEN) & _MASK)
+
+
+def _uniform(v):
+    return (_draw(v) >> 11) * (1.0 / (1 << 53))
+
+
+def _randint(v, a, b):
+    return a + _draw(v) % (b - a + 1)
+
+
+class Vehicle:
+    """Everything a vehicle carries between steps; a handoff pickles it to the next segment."""
+    __slots__ = ("vid", "pos", "speed", "total_wait", "resume_at", "inside", "last_seen", "key", "draws", "moved")
+
+    def __init__(self, vid, base_seed, min_speed, max_speed):
+        self.vid = vid
+        self.key = _mix64((base_seed + (vid + 1) * _GOLDEN) & _MASK)
+        self.draws = 0
+        self.pos = 0.0
+        self.speed = _randint(self, min_speed, max_speed)
+        self.total_wait = 0
+        self.resume_at = None   # set while waiting at an intersection
+        self.inside = ()        # RSUs whose direct range it was in after its last move
+        self.last_seen = {}     # rid -> seq of the last broadcast received
+        self.moved = None       # time of its last move (V2V receive happens after the sync)
+
+    # Pickled as one flat tuple: handoffs and rebalancing move thousands of vehicles
+    def __getstate__(self):
+        return (self.vid, self.pos, self.speed, self.total_wait, self.resume_at,
+                self.inside, self.last_seen, self.key, self.draws, self.moved)
+
+    def __setstate__(self, state):
+        (self.vid, self.pos, self.speed, self.total_wait, self.resume_at,
+         self.inside, self.last_seen, self.key, self.draws, self.moved) = state
+
+
+class RsuState:
+    """One RSU's table and broadcast register (and, while handed over, its mailboxes)."""
+
+    def __init__(self, site):
+        self.rid = site["id"]
+        self.position = site["position"]
+        self.connected = set()
+        self.arrival_at = {}
+        self.table = {}
+        self.broadcasts = BroadcastRegister()
+        self.previous_broadcast_id = None
+        self.mail = None
+
+
+# ------------ Segment (one worker's stretch of road) ------------
+class Segment:
+    """Segment `index` of the road, [cuts[index - 1], cuts[index]): its vehicles and
+    RSUs, with their mailboxes and V2V halo."""
+
+    def __init__(self, config, wanted, base_seed, cuts, index):
+        vcfg = config["vehicles"]
+        self.wanted = wanted
+        self.log_move = "VEHICLE_MOVE" in wanted
+        self.v2v_range = vcfg["v2v_range"]
+        self.v2v_ttl = vcfg.get("v2v_message_ttl", 5)
+        self.wait_prob = vcfg["intersection_wait_prob"]
+        self.wait_min = vcfg["intersection_wait_min"]
+        self.wait_max = vcfg["intersection_wait_max"]
+        self.intersections = sorted(config["intersections"]["positions"])
+
+        # The index knows every site; only RSUs in this segment ever get members
+        sites = rsu_sites(config)
+        self.coverage = CoverageIndex(sites)
+        self.mailboxes = RsuMailboxes()
+        # V2V messages are only kept (and exchanged) for V2V_RECEIVE subscribers
+        self.v2v = V2VChannel(self.v2v_range, self.v2v_ttl) if "V2V_RECEIVE" in wanted else None
+        self.receive_at = None  # step whose V2V receive waits for the halo
+
+        self.index = index
+        self._set_cuts(cuts)
+        self.vehicles = {}
+        self._order = []  # owned vids, ascending: the order vehicles are stepped in
+        self.rsus = {s["id"]: RsuState(s) for s in sites if self.owner(s["position"]) == index}
+        if self.owner(0.0) == index:
+            for vid in range(vcfg["count"]):
+                self.vehicles[vid] = Vehicle(vid, base_seed, vcfg["min_speed"], vcfg["max_speed"])
+            self._order = list(self.vehicles)
+
+    # ---- ownership ----
+    def _set_cuts(self, cuts):
+        self.cuts = cuts
+        self.lo = cuts[self.index - 1] if self.index > 0 else float("-inf")
+        self.hi = cuts[self.index] if self.index < len(cuts) else float("inf")
+
+    def owner(self, x):
+        return bisect.bisect_right(self.cuts, x)
+
+    def _adopt(self, parcels):
+        # Parcels stay pickled on their way through the coordinator
+        adopted = []
+        for parcel in parcels:
+            vehicles, rsus = pickle.loads(parcel)
+            for r in rsus:
+                self.rsus[r.rid] = r
+                self.mailboxes.attach(r.rid, r.mail)
+                r.mail = None
+            for v in vehicles:
+                self.vehicles[v.vid] = v
+                self.coverage.place(v.vid, v.pos)
+                adopted.append(v.vid)
+        if adopted:
+            self._order.extend(adopted)
+            self._order.sort()  # a sorted run plus a short tail: close to linear
+
+    def _hand_over(self, vids, rids=()):
+        """Removes these vehicles and RSUs; returns {segment: parcel} for their new owners."""
+        outgoing = {}
+        for vid in vids:
+            v = self.vehicles.pop(vid)
+            self.coverage.remove(vid)
+            outgoing.setdefault(self.owner(v.pos), ([], []))[0].append(v)
+        for rid in rids:
+            r = self.rsus.pop(rid)
+            r.mail = self.mailboxes.detach(rid)
+            outgoing.setdefault(self.owner(r.position), ([], []))[1].append(r)
+        if vids:
+            self._order = [vid for vid in self._order if vid in self.vehicles]
+        return {dest: pickle.dumps(parcel, pickle.HIGHEST_PROTOCOL) for dest, parcel in outgoing.items()}
+
+    def assign(self, parcels, cuts):
+        """Adopts the parcels in transit, then moves the segment edges.
+
+        Returns ({segment: parcel}, vehicles handed over) for what is now outside them.
+        """
+        self._adopt(parcels)
+        self._set_cuts(cuts)
+        vids = [vid for vid in self._order if self.owner(self.vehicles[vid].pos) != self.index]
+        rids = [rid for rid in sorted(self.rsus) if self.owner(self.rsus[rid].position) != self.index]
+        return self._hand_over(vids, rids), len(vids)
+
+    def sample(self, limit):
+        """Up to `limit` (position, vehicle count) points spanning this segment's active vehicles.
+
+        Vehicles waiting at an intersection cost next to nothing per step and are left out.
+        """
+        positions = sorted(v.pos for v in self.vehicles.values() if v.resume_at is None)
+        step = max(1, -(-len(positions) // limit))
+        return [(positions[i], min(step, len(positions) - i)) for i in range(0, len(positions), step)]
+
+    def finish(self):
+        return {vid: v.total_wait for vid, v in self.vehicles.items()}
+
+    # ---- one synchronization window ----
+    def advance(self, parcels, v2v_in, v2v_reset, rounds, t):
+        """Adopts handed-over vehicles/RSUs, finishes the last step's V2V receive,
+        runs the RSU rounds due before `t`, then the vehicle step at `t` (if any).
+
+        Returns the keyed events and rsu_log entries, the V2V messages sent, the
+        parcels for other segments and load figures, as a dict.
+        """
+        start = time.process_time()
+        events, rsu_log = [], []
+        self._adopt(parcels)
+        if self.v2v is not None:
+            if v2v_reset:
+                self.v2v = V2VChannel(self.v2v_range, self.v2v_ttl)
+            for m in v2v_in:
+                self.v2v.append(m)
+            if self.receive_at is not None:
+                self._v2v_receive(self.receive_at, events)
+        for tr in rounds:
+            for rid in sorted(self.rsus):
+                self._rsu_round(self.rsus[rid], tr, events, rsu_log)
+        v2v_out, leaving = [], []
+        active = 0
+        if t is not None:
+            active = self._vehicle_step(t, events, v2v_out, leaving)
+        self.receive_at = t
+        parcels = self._hand_over(leaving)
+        return {"events": events, "rsu_log": rsu_log, "v2v": v2v_out, "parcels": parcels,
+                "handoffs": len(leaving), "vehicles": len(self.vehicles), "active": active,
+                "cpu_s": time.process_time() - start}
+
+    def _announce(self, v, t, kind, wait, rsus, v2v_out):
+        # WAIT_START / WAIT_END to the V2V medium, WAIT_UPDATE to the RSUs in direct range
+        if self.v2v is not None:
+            v2v_out.append({"type": kind, "from": v.vid, "time": t, "pos": v.pos, "wait": wait})
+        for rid in rsus:
+            self.mailboxes.send_v2r(rid, {"type": "WAIT_UPDATE", "from": v.vid, "time": t, "pos": v.pos, "wait": wait})
+
+    def _vehicle_step(self, t, events, v2v_out, leaving):
+        """Steps every owned vehicle in vid order; returns how many moved."""
+        put = events.append
+        moved = 0
+        wanted = self.wanted
+        coverage = self.coverage
+        intersections = self.intersections
+        for vid in self._order:
+            v = self.vehicles[vid]
+            key = (t, VEHICLE_STEP, vid)
+            if v.resume_at is not None:
+                if v.resume_at > t:
+                    continue
+                v.resume_at = None
+                self._announce(v, t, "WAIT_END", v.total_wait, coverage.covering(v.pos), v2v_out)
+            else:
+                # First intersection in (pos, pos + speed]
+                i = bisect.bisect_right(intersections, v.pos)
+                if i < len(intersections) and intersections[i] <= v.pos + v.speed:
+                    v.pos = float(intersections[i])
+                    if _uniform(v) < self.wait_prob:
+                        wait_time = _randint(v, self.wait_min, self.wait_max)
+                        if "VEHICLE_WAIT_START" in wanted:
+                            put((key, {"type": "VEHICLE_WAIT_START", "time": t, "vid": vid,
+                                       "pos": v.pos, "wait_time": wait_time}))
+                        v.total_wait += wait_time
+                        v.resume_at = t + wait_time
+                        self._announce(v, t, "WAIT_START", v.total_wait, coverage.place(vid, v.pos), v2v_out)
+                        if v.pos >= self.hi:
+                            leaving.append(vid)
+                        continue
+
+            v.pos += v.speed
+            v.moved = t
+            moved += 1
+            covering = coverage.place(vid, v.pos)
+            if self.log_move:
+                put((key, {"type": "VEHICLE_MOVE", "time": t, "vid": vid, "pos": v.pos}))
+
+            # Direct V2R range: leave the RSUs that no longer cover us, then enter the new ones
+            if covering != v.inside:
+                for rid in v.inside:
+                    if rid not in covering:
+                        if "RSU_LEAVE" in wanted:
+                            put((key, {"type": "RSU_LEAVE", "time": t, "vid": vid, "pos": v.pos, "rid": rid}))
+                        self.mailboxes.send_v2r(rid, {"type": "BYE", "from": vid, "time": t, "pos": v.pos,
+                                                      "wait": v.total_wait, "to_rid": rid})
+                for rid in covering:
+                    if rid not in v.inside:
+                        if "RSU_ENTER" in wanted:
+                            put((key, {"type": "RSU_ENTER", "time": t, "vid": vid, "pos": v.pos, "rid": rid}))
+                        self.mailboxes.send_v2r(rid, {"type": "HELLO", "from": vid, "time": t, "pos": v.pos,
+                                                      "wait": v.total_wait, "to_rid": rid})
+                v.inside = covering
+
+            # Latest broadcast of each covering RSU, acknowledged once
+            for rid in covering:
+                bcast = self.rsus[rid].broadcasts.newer_than(v.last_seen.get(rid, -1))
+                if bcast:
+                    if "GLOBAL_RSU_BROADCAST_RECEIVE" in wanted:
+                        put((key, {"type": "GLOBAL_RSU_BROADCAST_RECEIVE", "time": t, "to_vid": vid,
+                                   "from_rid": rid, "broadcast_time": bcast["time"], "avg_wait": bcast["avg_wait"]}))
+                    self.mailboxes.send_ack(rid, {"type": "ACK", "from_vid": vid, "time": t, "to_rid": rid,
+                                                  "seq": bcast["seq"]})
+                    v.last_seen[rid] = bcast["seq"]
+
+            if v.pos >= self.hi:
+                leaving.append(vid)
+        return moved
+
+    def _v2v_receive(self, t, events):
+        put = events.append
+        self.v2v.expire(t)
+        for vid in self._order:
+            v = self.vehicles[vid]
+            if v.moved != t:
+                continue
+            key = (t, V2V_RECEIVE, vid)
+            for m in self.v2v.nearby(v.pos, self.v2v_range):
+                if m["from"] == vid:
+                    continue
+                status = "free" if m["wait"] == 0 else f"delayed {m['wait']}s"
+                put((key, {"type": "V2V_RECEIVE", "time": t, "from": m["from"], "to": vid,
+                           "msg_type": m["type"], "status": status}))
+
+    def _rsu_round(self, r, t, events, rsu_log):
+        key = (t, RSU_ROUND, r.rid)
+        rsu_round(r.rid, t, self.coverage.members(r.rid), r, r.broadcasts, self.mailboxes,
+                  lambda event: events.append((key, event)), self.wanted.__contains__,
+                  lambda visit: rsu_log.append((key, visit)))
+
+
+# ------------ Workers ------------
+def _serve(conn, *segment_args):
+    """Worker process: runs Segment method calls sent by the coordinator until told to stop."""
+    segment = Segment(*segment_args)
+    while True:
+        method, args = conn.recv()
+        if method is None:
+            break
+        try:
+            conn.send((True, getattr(segment, method)(*args)))
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+    conn.close()
+
+
+class _LocalSegment:
+    """A Segment in this process, called through the same submit()/result() pair."""
+
+    def __init__(self, *segment_args):
+        self.segment = Segment(*segment_args)
+        self._result = None
+
+    def submit(self, method, *args):
+        self._result = getattr(self.segment, method)(*args)
+
+    def result(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class _RemoteSegment:
+    def __init__(self, ctx, *segment_args):
+        self.index = segment_args[-1]
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child, *segment_args))
+        self.process.start()
+        child.close()
+
+    def _died(self, error):
+        self.process.join(timeout=1)
+        return RuntimeError(f"segment {self.index} worker died (exit code {self.process.exitcode}): {error!r}")
+
+    def submit(self, method, *args):
+        try:
+            self.conn.send((method, args))
+        except OSError as e:
+            raise self._died(e) from e
+
+    def result(self):
+        try:
+            ok, value = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise self._died(e) from e
+        if not ok:
+            raise RuntimeError(f"segment {self.index} worker failed:\n{value}")
+        return value
+
+    def close(self):
+        try:
+            self.conn.send((None, ()))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+# ------------ Coordinator ------------
+def _loads(points, cuts):
+    """Vehicles per segment for sampled (position, count) points and these edges."""
+    loads = [0] * (len(cuts) + 1)
+    for pos, count in points:
+        loads[bisect.bisect_right(cuts, pos)] += count
+    return loads
+
+
+class PartitionedSim:
+    def __init__(self, config, logger, seed=None):
+        self.config = config
+        self.logger = logger
+        pcfg = config.get("partitioning") or {}
+        self.workers = pcfg.get("workers") or os.cpu_count() or 1
+        self.rebalance_every = pcfg.get("rebalance_every", 10)
+        self.base_seed = (seed if seed is not None else random.getrandbits(64)) & _MASK
+        self.wanted = frozenset(t for t in EVENT_TYPES if logger.wants(t))
+        self.log_v2v = "V2V_RECEIVE" in self.wanted
+        self.v2v_range = config["vehicles"]["v2v_range"]
+        self.v2v_ttl = config["vehicles"].get("v2v_message_ttl", 5)
+        profiling = config.get("profiling") or {}
+        self.profiler = PhaseProfiler() if profiling.get("enabled") else None
+
+        # An edge may not fall within max_speed of an RSU's range (see the top of this file)
+        reach = config["vehicles"]["max_speed"]
+        self.sites = rsu_sites(config)
+        self.forbidden = []
+        for a, b in sorted((s["position"] - reach, s["position"] + s["range"] + reach) for s in self.sites):
+            if self.forbidden and a < self.forbidden[-1][1]:
+                self.forbidden[-1][1] = max(self.forbidden[-1][1], b)
+            else:
+                self.forbidden.append([a, b])
+
+        # Start with even edges over the farthest distance a vehicle can cover;
+        # the first rebalance moves them to where the vehicles actually are
+        steps = config["simulation_time"] / config["time_step"]
+        span = reach * steps
+        self.cuts = [self._snap(span * i / self.workers) for i in range(1, self.workers)]
+
+    def _snap(self, x):
+        """Nearest allowed segment edge to x."""
+        for a, b in self.forbidden:
+            if a < x < b:
+                return a if x - a <= b - x else b
+        return x
+
+    def _bounds(self, i):
+        lo = self.cuts[i - 1] if i > 0 else float("-inf")
+        hi = self.cuts[i] if i < len(self.cuts) else float("inf")
+        return lo, hi
+
+    def _call_all(self, method, args):
+        for segment, a in zip(self.segments, args):
+            segment.submit(method, *a)
+        return [segment.result() for segment in self.segments]
+
+    def _rebalance(self, inbox):
+        """Moves the edges to the vehicle-count quantiles.
+
+        Returns the replies of Segment.assign(), or None if the edges stay put.
+        """
+        samples = self._call_all("sample", [(SAMPLE_POINTS,)] * self.workers)
+        points = list(heapq.merge(*samples))
+        if not points:
+            return None
+        total = sum(w for _, w in points)
+        cuts, seen, i = [], 0, 0
+        for k in range(1, self.workers):
+            target = total * k / self.workers
+            while i < len(points) and seen + points[i][1] <= target:
+                seen += points[i][1]
+                i += 1
+            cuts.append(self._snap(points[i][0] if i < len(points) else points[-1][0]))
+        # Edges snapped out of an RSU's reach may not split a cluster any better than
+        # the current ones; moving them would only ship vehicles back and forth
+        if max(_loads(points, cuts)) * GAIN > max(_loads(points, self.cuts)):
+            return None
+        self.cuts = cuts
+        return self._call_all("assign", [(parcels, cuts) for parcels in inbox])
+
+    def _windows(self):
+        """(RSU round times, vehicle step time) per synchronization window; the last
+        window has no step (None), only the rounds left and the last V2V receive."""
+        config = self.config
+        until = config["simulation_time"]
+        dt = config["time_step"]
+        interval = config["rsus"]["broadcast_interval"]
+        k = j = 0
+        while True:
+            t = k * dt if k * dt < until else None
+            rounds = []
+            while j * interval < until and (t is None or j * interval <= t):
+                rounds.append(j * interval)
+                j += 1
+            yield rounds, t
+            if t is None:
+                return
+            k += 1
+
+    def _submit(self, rounds, t):
+        # The segments get the messages sent since the last window (all live ones after a reset)
+        if self.reset:
+            messages, self.unsent = list(self.messages), self.messages.cursor
+        else:
+            messages, self.unsent = self.messages.since(self.unsent)
+        for i, segment in enumerate(self.segments):
+            halo = []
+            if self.log_v2v:
+                lo, hi = self._bounds(i)
+                halo = [m for m in messages if lo - self.v2v_range <= m["pos"] <= hi + self.v2v_range]
+            segment.submit("advance", self.inbox[i], halo, self.reset, rounds, t)
+        self.inbox = [[] for _ in self.segments]
+        self.reset = False
+
+    def _deliver(self, replies):
+        for reply in replies:
+            for dest, parcel in reply["parcels"].items():
+                self.inbox[dest].append(parcel)
+
+    def run(self):
+        prof = self.profiler
+        put = self.logger.put
+
+        self.segments = []
+        try:
+            segment_args = (self.config, self.wanted, self.base_seed, self.cuts)
+            if self.workers == 1:
+                self.segments.append(_LocalSegment(*segment_args, 0))
+            else:
+                # Spawned, not forked: the GUI runs the simulation in a thread
+                ctx = multiprocessing.get_context("spawn")
+                for i in range(self.workers):
+                    self.segments.append(_RemoteSegment(ctx, *segment_args, i))
+
+            rsu_log = []
+            self.inbox = [[] for _ in self.segments]  # parcels of vehicles/RSUs per destination segment
+            self.messages = MessageStore(self.v2v_ttl)  # V2V messages still alive, in send order
+            self.unsent = self.messages.cursor          # first message the segments have not been given
+            self.reset = False                        # resend the whole halo (after the edges moved)
+            since_rebalance = self.rebalance_every - 1  # first check right after the first step
+            windows = self._windows()
+            rounds, t = next(windows)
+            self._submit(rounds, t)
+            while True:
+                replies = [segment.result() for segment in self.segments]
+                if prof:
+                    c0 = time.process_time()
+                    busy = [reply["cpu_s"] for reply in replies]
+                    for i, reply in enumerate(replies):
+                        prof.add(f"segment{i}.advance", reply["cpu_s"], vehicles=reply["vehicles"],
+                                 handoffs=reply["handoffs"])
+                    # What the window would take with every worker on its own core
+                    prof.add("partition.critical_path", max(busy))
+
+                # Hand the next window to the workers first ...
+                self._deliver(replies)
+                if self.log_v2v and t is not None:
+                    self.messages.expire(t)
+                    for m in heapq.merge(*(reply["v2v"] for reply in replies), key=itemgetter("from")):
+                        self.messages.append(m)
+                if t is not None:
+                    since_rebalance += 1
+                    counts = [reply["active"] for reply in replies]
+                    if (self.workers > 1 and since_rebalance >= self.rebalance_every
+                            and max(counts) > IMBALANCE * sum(counts) / self.workers):
+                        since_rebalance = 0
+                        t0 = time.perf_counter()
+                        assigned = self._rebalance(self.inbox)
+                        if assigned is not None:
+                            self.inbox = [[] for _ in self.segments]
+                            self._deliver({"parcels": parcels} for parcels, _ in assigned)
+                            self.reset = True
+                            if prof:
+                                prof.add("partition.rebalance", time.perf_counter() - t0,
+                                         migrated=sum(n for _, n in assigned))
+                    next_rounds, next_t = next(windows)
+                    self._submit(next_rounds, next_t)
+
+                # ... then merge this window's events while they run it
+                for _, event in heapq.merge(*(reply["events"] for reply in replies), key=itemgetter(0)):
+                    put(event)
+                rsu_log.extend(entry for _, entry in heapq.merge(*(reply["rsu_log"] for reply in replies),
+                                                                 key=itemgetter(0)))
+                if prof:
+                    prof.add("partition.coordinator", time.process_time() - c0)
+                if t is None:
+                    break
+                t = next_t
+
+            wait_log = {}
+            for part in self._call_all("finish", [()] * self.workers):
+                wait_log.update(part)
+            wait_log = dict(sorted(wait_log.items()))
+        finally:
+            for segment in self.segments:
+                segment.close()
+
+        sim_end = {"type": "SIM_END", "rsu_log": rsu_log, "wait_log": wait_log}
+        if prof:
+            sim_end["profile"] = prof.report()
+        put(sim_end)
+
+
+def run_partitioned(config, logger, seed=None):
+    PartitionedSim(config, logger, seed).run()
@@ -0,0 +1,96 @@
+from time import perf_counter
+
+# ------------ Hot-path profiling (opt-in) ------------
+# vehicle() and rsu() take an optional PhaseProfiler. With none (the default)
+# each phase costs one `if prof:` test; with one, they record the time spent
+# and item counts per phase, e.g. messages scanned versus delivered:
+#
+#   vehicle.move            position update, VEHICLE_MOVE, V2V expiry (expired)
+#   vehicle.v2v_receive     nearby V2V messages (scanned, delivered)
+#   vehicle.rsu_zone        direct-range enter/leave checks and HELLO/BYE
+#   vehicle.broadcast_receive  latest broadcast of each covering RSU (checked, received)
+#   rsu.coverage            vehicles in range, read from the coverage index (in_range)
+#   rsu.inbox               V2R mailbox (inbox_len, out_of_range)
+#   rsu.broadcast           building and publishing the broadcast
+#   rsu.acks                ACK mailbox (acks)
+#   sink.put                handing events to subscribers (queue puts)
+#
+# Enabled from the scenario:
+#
+#   profiling:
+#     enabled: true
+#     sample_interval: 10   # also emit a PROFILE event every 10 s (optional)
+
+clock = perf_counter
+
+
+class PhaseProfiler:
+    """Accumulates calls, time and counters per phase."""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, seconds, **counts):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = {"calls": 0, "time_s": 0.0}
+        stats["calls"] += 1
+        stats["time_s"] += seconds
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+
+    def snapshot(self):
+        return {phase: dict(stats) for phase, stats in self.phases.items()}
+
+    def report(self):
+        """Per-phase totals, with the mean time per call in microseconds."""
+        report = self.snapshot()
+        for stats in report.values():
+            stats["mean_us"] = stats["time_s"] / stats["calls"] * 1e6 if stats["calls"] else 0.0
+        return report
+
+
+def diff(current, previous):
+    """Per-phase change between two snapshots (phases with no calls are left out)."""
+    delta = {}
+    for phase, stats in current.items():
+        before = previous.get(phase, {})
+        changed = {key: value - before.get(key, 0) for key, value in stats.items()}
+        if changed["calls"]:
+            delta[phase] = changed
+    return delta
+
+
+def format_report(report):
+    """Text table of a report(), slowest phase first."""
+    lines = [f"{'phase':<24}{'calls':>10}{'time (s)':>11}{'mean (us)':>11}  counters"]
+    for phase, stats in sorted(report.items(), key=lambda item: -item[1]["time_s"]):
+        counters = ", ".join(f"{k}={v}" for k, v in stats.items()
+                             if k not in ("calls", "time_s", "mean_us"))
+        mean_us = stats.get("mean_us", stats["time_s"] / stats["calls"] * 1e6 if stats["calls"] else 0.0)
+        lines.append(f"{phase:<24}{stats['calls']:>10}{stats['time_s']:>11.4f}{mean_us:>11.2f}  {counters}")
+    return "\n".join(lines)
+
+
+class TimedSink:
+    """Wraps an event sink so the time spent in its put() lands in "sink.put"."""
+
+    def __init__(self, sink, profiler):
+        self.sink = sink
+        self.profiler = profiler
+
+    def put(self, event):
+        t0 = clock()
+        self.sink.put(event)
+        self.profiler.add("sink.put", clock() - t0)
+
+
+def profile_sampler(env, profiler, logger, interval):
+    """SimPy process emitting a PROFILE event with the last interval's per-phase deltas."""
+    previous = profiler.snapshot()
+    while True:
+        yield env.timeout(interval)
+        current = profiler.snapshot()
+        logger.put({"type": "PROFILE", "time": env.now, "interval": interval,
+                    "phases": diff(current, previous)})
+        previous = current
@@ -0,0 +1,97 @@
+from statistics import mean
+
+from profiling import clock
+
+# ------------ One RSU broadcast round (shared by every engine) ------------
+# Each engine finds the vehicles in an RSU's direct range its own way (the
+# coverage index members, an array lookup, ...) and hands them to rsu_round(),
+# which does the rest of the round exactly as main.rsu() always has:
+#
+#   1. arrivals and departures against the connected set (RSU_ARRIVED/DEPARTED,
+#      one rsu_log record per departure)
+#   2. drain the V2R mailbox into the table (or RSU_V2R_MESSAGE_OUT_OF_RANGE)
+#   3. publish the broadcast (connected vehicles and their average wait)
+#   4. drain the ACKs of the previous broadcast (RSU_ACK_RECEIVED/ACK_SUMMARY)
+#
+# The state is anything with connected/arrival_at/table/previous_broadcast_id
+# (simstate.RsuState, partitioned.RsuState).
+
+
+def rsu_round(rid, now, in_range, state, broadcasts, mailboxes, put, wants, record, profiler=None):
+    """Runs RSU rid's round at `now` for the vehicles `in_range` and returns the broadcast's seq.
+
+    Events go to put(event) when wants(event type); departures to record({"vehicle",
+    "arrival", "departure"}). With a profiler the rsu.inbox, rsu.broadcast and rsu.acks
+    phases are timed.
+    """
+    prof = profiler
+    connected = state.connected
+    arrival_at = state.arrival_at
+    table = state.table
+
+    for vid in sorted(in_range - connected):
+        if wants("RSU_ARRIVED"):
+            put({"type": "RSU_ARRIVED", "time": now, "rid": rid, "vid": vid})
+        connected.add(vid)
+        arrival_at[vid] = now
+        rec = table.setdefault(vid, {})
+        rec["first_seen"] = rec["last_seen"] = now
+
+    for vid in sorted(connected - in_range):
+        if wants("RSU_DEPARTED"):
+            put({"type": "RSU_DEPARTED", "time": now, "rid": rid, "vid": vid})
+        connected.remove(vid)
+        record({"vehicle": vid, "arrival": arrival_at.get(vid), "departure": now})
+        table.setdefault(vid, {})["last_seen"] = now
+
+    # V2R inbox: the mailbox only holds messages addressed to this RSU
+    if prof:
+        t0 = clock()
+        inbox_len = out_of_range = 0
+    for m in mailboxes.drain_v2r(rid):
+        if prof: inbox_len += 1
+        vid = m["from"]
+        if vid in connected:
+            rec = table.setdefault(vid, {})
+            rec["last_pos"] = m["pos"]
+            rec["last_wait"] = m.get("wait", rec.get("last_wait", 0))
+            rec["last_update"] = m["time"]
+        else: # Sent just before the vehicle left
+            if prof: out_of_range += 1
+            if wants("RSU_V2R_MESSAGE_OUT_OF_RANGE"):
+                put({"type": "RSU_V2R_MESSAGE_OUT_OF_RANGE", "time": now, "rid": rid,
+                     "from_vid": vid, "msg_type": m["type"]})
+    if prof:
+        prof.add("rsu.inbox", clock() - t0, inbox_len=inbox_len, out_of_range=out_of_range)
+        t0 = clock()
+
+    connected_list = sorted(connected)
+    waits = [table[v].get("last_wait", 0) for v in connected_list if v in table]
+    broadcast_id = f"RSU{rid}_BCAST_{int(now)}"
+    bcast = {
+        "type": "RSU_GLOBAL_BROADCAST", "from": rid, "time": now, "broadcast_id": broadcast_id,
+        "connected_count": len(connected_list), "avg_wait": mean(waits) if waits else 0,
+        "connected_vids": connected_list
+    }
+    # Publishing stamps the message with this RSU's next sequence number ("seq")
+    seq = broadcasts.publish(bcast)
+    if wants("RSU_GLOBAL_BROADCAST"):
+        put(bcast)
+    if prof:
+        prof.add("rsu.broadcast", clock() - t0)
+        t0 = clock()
+
+    # Vehicles acknowledge a broadcast after receiving it, so the ACKs waiting now
+    # are for the previous one (seq - 1); anything older is dropped
+    acked_id, state.previous_broadcast_id = state.previous_broadcast_id, broadcast_id
+    acknowledged_by = set()
+    for ack_msg in mailboxes.drain_acks(rid, seq - 1):
+        acknowledged_by.add(ack_msg["from_vid"])
+        if wants("RSU_ACK_RECEIVED"):
+            put({"type": "RSU_ACK_RECEIVED", "time": now, "rid": rid, "from_vid": ack_msg["from_vid"],
+                 "broadcast_id": acked_id, "seq": ack_msg["seq"]})
+    if acknowledged_by and wants("RSU_BROADCAST_ACK_SUMMARY"):
+        put({"type": "RSU_BROADCAST_ACK_SUMMARY", "time": now, "rid": rid, "broadcast_id": acked_id,
+             "seq": seq - 1, "ack_count": len(acknowledged_by), "acknowledged_vids": sorted(acknowledged_by)})
+    if prof: prof.add("rsu.acks", clock() - t0, acks=len(acknowledged_by))
+    return seq
@@ -1,30 +1,243 @@
+import argparse
+import bisect
 import queue
 import threading
-import tkinter as tk
-import pygame
 import os
 
-from main import main as run_sim_logic
-from visualizer import LogWindow, SimVisualizer
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main as run_sim_logic
 
-if __name__ == "__main__":
-    # --- 1. RUN SIMULATION & COLLECT DATA ---
-    log_queue = queue.Queue()
-    sim_thread = threading.Thread(target=run_sim_logic, args=(log_queue,), daemon=True)
-    sim_thread.start()
-    print("Simulation thread started. Waiting for it to complete...")
-    sim_thread.join()
-    print("Simulation thread finished. Collecting results...")
-    
-    all_events = []
-    while not log_queue.empty():
-        all_events.append(log_queue.get())
-    all_events.sort(key=lambda x: x.get("time", 0))
-    print(f"Collected {len(all_events)} simulation events. Starting visualization.")
+# GUI (tkinter, pygame, visualizer) and NumPy (eventlog) modules are imported
+# only once playback actually starts; `python -m simulate` runs without them.
+
+# Bound on events buffered between the simulation thread and the playback loop.
+# When it is full the simulation blocks in put() until playback catches up.
+STREAM_QUEUE_SIZE = 10000
+
+# Playback keeps a SimVisualizer.vehicle_states keyframe every KEYFRAME_EVERY
+# events. A seek restores the nearest keyframe at or before the target and
+# replays only the events after it, so its cost is bounded by this interval.
+KEYFRAME_EVERY = 5000
+SEEK_STEP = 10.0        # seconds per LEFT/RIGHT press (x6 with SHIFT)
+
+# Live playback keeps about the last HISTORY_EVENTS events behind the playback
+# position for rewinding (dropped in whole keyframe intervals); earlier times
+# are out of reach, so a long live run stays within bounded memory. A saved
+# event log (--record / --replay) can be rewound all the way from disk.
+HISTORY_EVENTS = 200_000
+
+class QueueEventSource:
+    """Events from the simulation thread, kept so playback can seek back.
+
+    Events are produced in nondecreasing simulation time, so pull() only
+    needs to hold back the first event that is still in the future. Indexes
+    count every event since the start; forget() drops the oldest ones, and
+    `first` is the index of the oldest event still kept.
+    """
+    def __init__(self, log_queue, sim_thread):
+        self.log_queue = log_queue
+        self.sim_thread = sim_thread
+        self.pending = None
+        self.complete = False
+        self.events, self.times = [], []
+        self.first = 0
+
+    def __len__(self):
+        return self.first + len(self.events)
+
+    def event(self, i):
+        return self.events[i - self.first]
+
+    def index_after(self, simulation_time):
+        return self.first + bisect.bisect_right(self.times, simulation_time)
+
+    @property
+    def earliest_time(self):
+        """Earliest playback time that can still be restored."""
+        return self.times[0] if self.first and self.times else 0.0
+
+    def forget(self, before):
+        """Drops the events with index < before."""
+        n = min(before, len(self)) - self.first
+        if n > 0:
+            del self.events[:n], self.times[:n]
+            self.first += n
+
+    def pull(self, simulation_time):
+        """Takes every event up to simulation_time that has arrived so far.
+
+        Returns the time up to which the history is complete: playback must
+        not run ahead of what the simulation has delivered.
+        """
+        while not self.complete:
+            if self.pending is None:
+                try:
+                    self.pending = self.log_queue.get_nowait()
+                except queue.Empty:
+                    if not self.sim_thread.is_alive() and self.log_queue.empty():
+                        self.complete = True
+                        break
+                    return self.times[-1] if self.times else 0.0
+            # SIM_END / FATAL_ERROR carry no time and are played as soon as they are reached
+            event_time = self.pending.get("time", self.times[-1] if self.times else 0.0)
+            if event_time > simulation_time:
+                return simulation_time
+            event, self.pending = self.pending, None
+            if event.get("type") in ("SIM_END", "FATAL_ERROR"):
+                self.complete = True
+            self.events.append(event)
+            self.times.append(event_time)
+        return float("inf")
+
+class ReplayEventSource:
+    """Events from a saved binary event log (see eventlog.py)."""
+    complete = True
+    first = 0
+    earliest_time = 0.0
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __len__(self):
+        return len(self.reader)
+
+    def event(self, i):
+        return self.reader.event(i)
+
+    def index_after(self, simulation_time):
+        return self.reader.index_after(simulation_time)
+
+    def pull(self, simulation_time):
+        return float("inf")
+
+    def forget(self, before):
+        pass  # The log stays on disk
+
+    def vehicle_keyframes(self, every):
+        """Yields (event offset, vehicle_states) for offsets every, 2*every, ...
+
+        Built straight from the record columns (vid in "a", pos in "x") without
+        decoding events, so every keyframe of a long log is ready before the
+        first seek. The states match what SimVisualizer.process_message builds.
+        """
+        import numpy as np
+        from eventlog import BIT, FIELDS
+        records = self.reader.records
+        type_ids = {name: i for i, name in enumerate(self.reader.types)}
+        move, wait = type_ids.get("VEHICLE_MOVE", -1), type_ids.get("VEHICLE_WAIT_START", -1)
+        with_vid = [type_ids[t] for t, fields in FIELDS.items() if fields.get("vid") == "a" and t in type_ids]
+        states = {}
+        for offset in range(every, len(records) + 1, every):
+            chunk = records[offset - every:offset]
+            types, has_vid = chunk["type"], (chunk["mask"] & BIT["a"]) != 0
+            for vid in np.unique(chunk["a"][np.isin(types, with_vid) & has_vid]).tolist():
+                states.setdefault(vid, {"pos": 0, "waiting": False})
+            moves = np.flatnonzero(((types == move) | (types == wait)) & has_vid & ((chunk["mask"] & BIT["x"]) != 0))
+            if len(moves):
+                # Last move/wait of each vehicle within the chunk wins
+                vids = chunk["a"][moves][::-1]
+                vids, first = np.unique(vids, return_index=True)
+                last = moves[::-1][first]
+                for vid, pos, etype in zip(vids.tolist(), chunk["x"][last].tolist(), types[last].tolist()):
+                    states[vid] = {"pos": pos, "waiting": etype == wait}
+            yield offset, {vid: dict(state) for vid, state in states.items()}
+
+class Player:
+    """Drives the visualizer from an event source along a playback clock that can jump.
+
+    tick() plays forward at `speed`; seek() moves the clock anywhere in the
+    history that has arrived and is still kept, restoring the nearest
+    keyframe first.
+    """
+    def __init__(self, source, visualizer, log_app=None):
+        self.source = source
+        self.visualizer = visualizer
+        self.log_app = log_app
+        self.time = 0.0
+        self.index = 0           # next event to apply
+        self.speed = 1.0
+        self.paused = False
+        self.keyframes = {0: {}} # keyframes[k]: vehicle states before event k * KEYFRAME_EVERY
+        if hasattr(source, "vehicle_keyframes"):
+            self.keyframes.update((offset // KEYFRAME_EVERY, states)
+                                  for offset, states in source.vehicle_keyframes(KEYFRAME_EVERY))
+
+    @property
+    def finished(self):
+        return self.source.complete and self.index >= len(self.source)
+
+    def _apply(self, stop, log=False):
+        for i in range(self.index, stop):
+            event = self.source.event(i)
+            self.visualizer.process_message(event)
+            if log and self.log_app is not None:
+                self.log_app.add_log_entry(event)
+            if (i + 1) % KEYFRAME_EVERY == 0 and (i + 1) // KEYFRAME_EVERY not in self.keyframes:
+                self.keyframes[(i + 1) // KEYFRAME_EVERY] = {vid: dict(s) for vid, s in self.visualizer.vehicle_states.items()}
+        self.index = max(self.index, stop)
+
+    def _trim(self):
+        # Forget whole keyframe intervals more than HISTORY_EVENTS behind playback,
+        # with the keyframes that would need them
+        keep_from = (self.index - HISTORY_EVENTS) // KEYFRAME_EVERY
+        if keep_from > min(self.keyframes):
+            for k in [k for k in self.keyframes if k < keep_from]:
+                del self.keyframes[k]
+            self.source.forget(keep_from * KEYFRAME_EVERY)
+
+    def tick(self, delta_seconds):
+        if self.paused:
+            return
+        target = self.time + delta_seconds * self.speed
+        self.time = min(target, self.source.pull(target))
+        self._apply(self.source.index_after(self.time), log=True)
+        self._trim()
+
+    def seek(self, simulation_time):
+        simulation_time = max(self.source.earliest_time, simulation_time)
+        simulation_time = min(simulation_time, self.source.pull(simulation_time))
+        target = self.source.index_after(simulation_time)
+        k = min(target // KEYFRAME_EVERY, max(self.keyframes))
+        # Restore a keyframe when going back, or when it skips events going forward
+        if target < self.index or k * KEYFRAME_EVERY > self.index:
+            self.visualizer.vehicle_states = {vid: dict(s) for vid, s in self.keyframes[k].items()}
+            self.visualizer.changed = True
+            self.index = k * KEYFRAME_EVERY
+        self._apply(target)
+        self.time = simulation_time
+
+    def handle_key(self, event):
+        import pygame
+        step = SEEK_STEP * (6 if event.mod & pygame.KMOD_SHIFT else 1)
+        if event.key == pygame.K_SPACE:
+            self.paused = not self.paused
+        elif event.key == pygame.K_RIGHT:
+            self.seek(self.time + step)
+        elif event.key == pygame.K_LEFT:
+            self.seek(self.time - step)
+        elif event.key == pygame.K_HOME:
+            self.seek(0.0)
+        elif event.key == pygame.K_UP:
+            self.speed = min(self.speed * 2, 256.0)
+        elif event.key == pygame.K_DOWN:
+            self.speed = max(self.speed / 2, 1 / 16)
+
+def record_sim(log_queue, path, config, seed=None):
+    # Producer side: the writer saves every event, then forwards it to playback
+    from eventlog import EventLogWriter
+    with EventLogWriter(path, forward=log_queue) as writer:
+        run_sim_logic(writer, config, seed)
+
+def play(source, config=None, start=0.0):
+    """Opens the visualizer and log windows and plays `source` until the window is closed."""
+    import tkinter as tk
+    import pygame
+    from visualizer import LogWindow, SimVisualizer
 
     # --- 2. SETUP GUIS ---
     os.environ['SDL_VIDEO_WINDOW_POS'] = "50,70"
-    visualizer = SimVisualizer()
+    # A replayed log carries no scenario, so the visualizer falls back to the default geometry
+    visualizer = SimVisualizer(None if config is None or config.get("type") == "FATAL_ERROR" else config)
     root = tk.Tk()
     root.withdraw()
     log_tk_window = tk.Toplevel(root)
@@ -32,10 +245,13 @@ if __name__ == "__main__":
     log_app = LogWindow(log_tk_window)
 
     # --- 3. PLAYBACK LOOP ---
-    playback_speed = 1.0
-    simulation_time = 0.0
-    event_index = 0
+    player = Player(source, visualizer, log_app)
+    if start:
+        player.seek(start)
+    pygame.key.set_repeat(300, 50)   # hold LEFT/RIGHT to scrub
     running = True
+    reported_end = False
+    last_caption = None
 
     while running:
         # --- KEY CHANGE: Handle the VIDEORESIZE event ---
@@ -45,30 +261,161 @@ if __name__ == "__main__":
             # If the user resizes the window, call our handler function
             if event.type == pygame.VIDEORESIZE:
                 visualizer.handle_resize(event)
+            if event.type == pygame.KEYDOWN:
+                player.handle_key(event)
 
-        # Advance the simulation clock
+        # Advance the playback clock and play the events up to it
         delta_time_ms = visualizer.clock.tick(60)
-        simulation_time += (delta_time_ms / 1000.0) * playback_speed
+        player.tick(delta_time_ms / 1000.0)
+        caption = f"VANET Simulation  t={player.time:.1f}s  x{player.speed:g}" + ("  [paused]" if player.paused else "")
+        if caption != last_caption:
+            pygame.display.set_caption(caption)
+            last_caption = caption
 
-        # Process events for the current time
-        while event_index < len(all_events) and all_events[event_index].get("time", 0) <= simulation_time:
-            current_event = all_events[event_index]
-            visualizer.process_message(current_event)
-            log_app.add_log_entry(current_event)
-            event_index += 1
-
-        # Redraw windows
+        # Redraw windows (the log table takes this frame's events in one batch)
         visualizer.draw()
+        log_app.refresh()
         try:
             root.update()
         except tk.TclError:
             running = False
 
-        # End after playback
-        if event_index >= len(all_events) and not sim_thread.is_alive():
+        # The window stays open at the end so the run can still be rewound
+        if player.finished and not reported_end:
             print("Playback finished.")
-            pygame.time.wait(3000)
+            reported_end = True
+        elif not player.finished:
+            reported_end = False
+
+    pygame.quit()
+
+def live_view(table_name, log_queue, config):
+    """Viewer process for --live: draws the shared state table, logs the queued events.
+
+    The simulation runs in the parent process and publishes vehicle states to
+    the table (see statetable.py); nothing here blocks it. SPACE pauses it and
+    UP/DOWN change how many simulated seconds pass per wall-clock second.
+    """
+    import queue as queue_module
+    import tkinter as tk
+    import pygame
+    from statetable import StateTableReader
+    from visualizer import LogWindow, SimVisualizer
+
+    os.environ['SDL_VIDEO_WINDOW_POS'] = "50,70"
+    reader = StateTableReader(table_name)
+    visualizer = SimVisualizer(config)
+    root = tk.Tk()
+    root.withdraw()
+    log_tk_window = tk.Toplevel(root)
+    log_tk_window.geometry(f"750x{visualizer.height}")
+    log_app = LogWindow(log_tk_window)
+
+    speed, paused = 1.0, False
+    reader.set_rate(speed)
+    seq, now, connected = None, 0.0, 0
+    finished, last_caption = False, None
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.VIDEORESIZE:
+                visualizer.handle_resize(event)
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed = min(speed * 2, 256.0)
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed / 2, 1 / 16)
+                reader.set_rate(0.0 if paused else speed)
+
+        visualizer.clock.tick(60)
+        if reader.seq != seq:
+            snapshot = reader.snapshot()
+            seq, now = snapshot.seq, snapshot.time
+            connected = sum(1 for rid in snapshot.rsu if rid >= 0)
+            visualizer.apply_snapshot(snapshot)
+        while True:
+            try:
+                message = log_queue.get_nowait()
+            except queue_module.Empty:
+                break
+            log_app.add_log_entry(message)
+            if message.get("type") in ("SIM_END", "FATAL_ERROR"):
+                finished = True
+                print("Simulation finished.")
+
+        caption = (f"VANET Simulation (live)  t={now:.1f}s  x{speed:g}  in RSU range: {connected}"
+                   + ("  [finished]" if finished else "  [paused]" if paused else ""))
+        if caption != last_caption:
+            pygame.display.set_caption(caption)
+            last_caption = caption
+
+        visualizer.draw()
+        log_app.refresh()
+        try:
+            root.update()
+        except tk.TclError:
             running = False
 
+    # Let the simulation finish unpaced once nobody is watching
+    reader.set_rate(float("inf"))
+    reader.close()
     pygame.quit()
 
+def run_live(config, seed=None):
+    """Simulates in this process and shows it in a live_view process until its window closes."""
+    import multiprocessing
+    from statetable import VehicleStateTable
+
+    table = VehicleStateTable(config["vehicles"]["count"], shared=True)
+    log_queue = multiprocessing.Queue()
+    log_queue.cancel_join_thread()   # the viewer may close before it has read everything
+    viewer = multiprocessing.Process(target=live_view, args=(table.name, log_queue, config))
+    viewer.start()
+    try:
+        # Positions reach the viewer through the table, so no per-step events are built
+        run_sim_logic(EventLogger(log_queue, "normal"), config, seed, table)
+        viewer.join()
+    finally:
+        table.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VANET simulation with live playback (headless runs: python -m simulate)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="scenario YAML")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible run")
+    parser.add_argument("--record", metavar="LOG_DIR", help="also save the run as a binary event log")
+    parser.add_argument("--replay", metavar="LOG_DIR", help="play a saved event log instead of simulating")
+    parser.add_argument("--start", type=float, default=0.0, help="replay: start at this simulated time")
+    parser.add_argument("--live", action="store_true",
+                        help="view the running simulation from a separate process through shared memory (no seeking)")
+    parser.epilog = "Keys: SPACE pause, LEFT/RIGHT seek 10 s (SHIFT: 60 s), HOME rewind, UP/DOWN speed x2 / x0.5"
+    args = parser.parse_args()
+
+    # --- 1. START SIMULATION (streams into a bounded queue) OR OPEN A SAVED LOG ---
+    config = None
+    if args.live:
+        config = load_config(args.config)
+        if config.get("type") == "FATAL_ERROR" or config.get("engine", "simpy") != "simpy":
+            parser.error("--live needs a loadable scenario with the simpy engine")
+        run_live(config, args.seed)
+        parser.exit()
+    if args.replay:
+        from eventlog import EventLogReader
+        source = ReplayEventSource(EventLogReader(args.replay))
+        print(f"Replaying {len(source)} events from {args.replay}")
+    else:
+        # Loaded here so the visualizer draws the same road, RSUs and intersections
+        config = load_config(args.config)
+        log_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        if args.record:
+            sim_thread = threading.Thread(target=record_sim, args=(log_queue, args.record, config, args.seed), daemon=True)
+        else:
+            sim_thread = threading.Thread(target=run_sim_logic, args=(log_queue, config, args.seed), daemon=True)
+        sim_thread.start()
+        print("Simulation thread started. Streaming events into playback...")
+        source = QueueEventSource(log_queue, sim_thread)
+
+    play(source, config, args.start)
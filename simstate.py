@@ -0,0 +1,109 @@
+from channels import BroadcastRegister, RsuMailboxes, V2VChannel
+from coverage import CoverageIndex, rsu_sites
+from statetable import VehicleStateTable
+
+# ------------ Explicit simulation state (simpy engine) ------------
+# vehicle() and rsu() keep everything they carry from one wake-up to the next
+# in a VehicleState / RsuState instead of generator locals, and SimState holds
+# those together with the shared world (channels, mailboxes, coverage, logs
+# and the RNG). A SimState taken between two instants is therefore the whole
+# simulation: checkpoint.py copies it and resumes runs from it.
+#
+# Processes that wake at the same instant run in the order they went to sleep.
+# Each sleep takes a number from the run's WakeCounter (shared by all its
+# process states), so a resumed run can start its processes in that order and
+# continue exactly as the original would have.
+
+
+class WakeCounter:
+    """Numbers the sleeps of one run: wakes() returns 1, 2, 3, ..."""
+    __slots__ = ("n",)
+
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self):
+        self.n += 1
+        return self.n
+
+    def __getstate__(self):
+        return (self.n,)
+
+    def __setstate__(self, state):
+        self.n, = state
+
+
+class VehicleState:
+    """What a vehicle() process carries between steps."""
+    __slots__ = ("speed", "pos", "total_wait", "inside", "last_seen", "waiting_under", "wake_at", "wake_seq",
+                 "wakes")
+
+    def __init__(self, wakes=None):
+        self.speed = None         # drawn when the process first runs
+        self.pos = 0.0
+        self.total_wait = 0
+        self.inside = ()          # RSUs whose direct V2R range it was in after its last move
+        self.last_seen = {}       # rid -> seq of the last broadcast received
+        self.waiting_under = None # while waiting at an intersection: the RSUs covering it
+        self.wake_at = None       # None until the process first sleeps
+        self.wake_seq = None
+        self.wakes = wakes if wakes is not None else WakeCounter()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class RsuState:
+    """What an rsu() process carries between broadcasts."""
+    __slots__ = ("connected", "arrival_at", "table", "previous_broadcast_id", "wake_at", "wake_seq", "wakes")
+
+    def __init__(self, wakes=None):
+        self.connected = set()
+        self.arrival_at = {}
+        self.table = {}
+        self.previous_broadcast_id = None
+        self.wake_at = None
+        self.wake_seq = None
+        self.wakes = wakes if wakes is not None else WakeCounter()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class SimState:
+    """Everything a simpy-engine run carries across instants, built fresh for `config`."""
+
+    def __init__(self, config, rng):
+        vcfg = config["vehicles"]
+        self.time = 0          # simulated time it was taken at (simpy starts at int 0)
+        self.rng = rng
+        self.rsu_log, self.wait_log = [], {}
+        self.mailboxes = RsuMailboxes()
+        self.v2v_channel = V2VChannel(vcfg["v2v_range"], vcfg.get("v2v_message_ttl", 5))
+        self.sites = rsu_sites(config)
+        self.coverage = CoverageIndex(self.sites)
+        self.broadcasts = [BroadcastRegister() for _ in self.sites]
+        self.vehicles_state = VehicleStateTable(vcfg["count"])
+        self.wakes = WakeCounter()
+        self.vehicles = [VehicleState(self.wakes) for _ in range(vcfg["count"])]
+        self.rsus = [RsuState(self.wakes) for _ in self.sites]
+
+    @property
+    def resumed(self):
+        """True once the processes have run (the state came from a checkpoint)."""
+        return any(s.wake_at is not None for s in self.vehicles + self.rsus)
+
+    def use_table(self, table):
+        """Continues in `table` (e.g. a shared one) from the current vehicle states."""
+        table.pos[:] = self.vehicles_state.pos
+        table.speed[:] = self.vehicles_state.speed
+        table.rsu[:] = self.vehicles_state.rsu
+        self.vehicles_state = table
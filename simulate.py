@@ -0,0 +1,145 @@
+import argparse
+import copy
+import json
+import sys
+import time
+
+import yaml
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main as run_sim
+from metrics import OnlineMetrics, check_parquet
+from sweep import RunSummary, set_param
+
+# ------------ Headless runner ------------
+# Runs one scenario without any GUI (no tkinter, pygame or visualizer import)
+# and writes the results to files:
+#
+#   python -m simulate --config scenario_simple.yaml --seed 7 --until 600 \
+#       --summary run_summary.json --events events.jsonl --event-log run_log/
+#
+# --events writes every subscribed event as JSON Lines; --event-log writes the
+# binary log that `run_simulation.py --replay` plays back; --metrics writes
+# periodic snapshots of online metrics (see metrics.py) without keeping events.
+# --checkpoint continues a saved warm-up (checkpoint.py) instead of starting at 0.
+
+
+class JsonLinesSink:
+    """Event sink writing one JSON object per line."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def put(self, event):
+        self.f.write(json.dumps(event, default=_json_default))
+        self.f.write("\n")
+
+
+def _json_default(value):
+    # NumPy scalars from the vectorized engine
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def parse_set(text):
+    key, _, value = text.partition("=")
+    if not key or not value:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    return key, yaml.safe_load(value)
+
+
+def run(config, seed=None, level="normal", events_path=None, event_log_path=None,
+        metrics_path=None, metrics_interval=10.0, checkpoint=None):
+    """Runs one scenario headless; returns the summary dict (see RunSummary.result())."""
+    summary = RunSummary()
+    logger = EventLogger(summary, RunSummary.TYPES)
+    metrics = None
+    if metrics_path and str(metrics_path).endswith(".parquet"):
+        check_parquet()  # Before the run, not after it
+    if metrics_path:
+        metrics = OnlineMetrics(metrics_interval)
+        logger.subscribe(metrics, OnlineMetrics.TYPES)
+    files = []
+    try:
+        if events_path:
+            files.append(open(events_path, "w"))
+            logger.subscribe(JsonLinesSink(files[-1]), level)
+        if event_log_path:
+            from eventlog import EventLogWriter  # NumPy is only loaded when a binary log is wanted
+            files.append(EventLogWriter(event_log_path))
+            logger.subscribe(files[-1], level)
+
+        start = time.perf_counter()
+        run_sim(logger, config, seed, checkpoint=checkpoint)
+        wall = time.perf_counter() - start
+    finally:
+        for f in files:
+            f.close()
+
+    result = {"engine": config.get("engine", "simpy"), "seed": seed, "simulation_time": config.get("simulation_time"), "wall_s": wall, **summary.result()}
+    if metrics:
+        metrics.export(metrics_path)
+        result["metrics"] = metrics.result()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m simulate", description="Headless VANET simulation run")
+    parser.add_argument("--config", default=None, help="scenario YAML (default: the checkpoint's, else the bundled one)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="continue from a saved checkpoint (see checkpoint.py)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible run")
+    parser.add_argument("--until", type=float, default=None, help="simulated seconds (overrides simulation_time)")
+    parser.add_argument("--set", action="append", type=parse_set, default=[], metavar="KEY=VALUE",
+                        help="override a dotted config key, e.g. vehicles.count=500")
+    parser.add_argument("--level", default="normal", choices=["summary", "normal", "verbose"],
+                        help="events written to --events / --event-log")
+    parser.add_argument("--summary", default="run_summary.json", help="summary JSON file ('-' for stdout)")
+    parser.add_argument("--events", metavar="PATH", help="write events as JSON Lines")
+    parser.add_argument("--event-log", metavar="DIR", help="write a binary event log (for --replay)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write periodic metric snapshots (.csv, or .parquet with pandas and pyarrow)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="simulated seconds between metric snapshots")
+    parser.add_argument("--profile", action="store_true", help="enable phase profiling (report in the summary)")
+    args = parser.parse_args()
+    if args.metrics and args.metrics.endswith(".parquet"):
+        try:
+            check_parquet()
+        except ImportError as e:
+            parser.error(str(e))
+
+    checkpoint = None
+    if args.checkpoint:
+        from checkpoint import Checkpoint
+        checkpoint = Checkpoint.load(args.checkpoint)
+    if checkpoint and args.config is None:
+        config = copy.deepcopy(checkpoint.config)
+    else:
+        config = load_config(args.config or DEFAULT_CONFIG)
+    if config.get("type") == "FATAL_ERROR":
+        sys.exit(f"{config['message']} ({config['path']})")
+    if args.until is not None:
+        if args.until <= 0:
+            parser.error("--until must be positive")
+        config["simulation_time"] = args.until
+    for key, value in args.set:
+        set_param(config, key, value)
+    if args.profile:
+        config["profiling"] = dict(config.get("profiling") or {}, enabled=True)
+
+    if config.get("engine", "simpy") == "partitioned":
+        print("note: engine: partitioned draws per-vehicle random numbers; a seed does not "
+              "reproduce the simpy or vectorized engine's run", file=sys.stderr)
+    try:
+        result = run(config, args.seed, args.level, args.events, args.event_log,
+                     args.metrics, args.metrics_interval, checkpoint)
+    except ValueError as e:   # a config the checkpoint cannot continue under
+        parser.error(str(e))
+    if args.summary == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.summary, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Simulated {result['simulation_time']}s in {result['wall_s']:.2f}s; summary written to {args.summary}")
@@ -0,0 +1,180 @@
+import math
+import time
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+# ------------ Vehicle state table (struct of arrays, optionally shared) ------------
+# One slot per vehicle id in three flat arrays, updated in place by the vehicles:
+#
+#   pos     float64   meters along the road (NaN until the vehicle is placed)
+#   speed   float64   m/s; 0 while waiting at an intersection
+#   rsu     int32     first RSU whose direct range covers pos (-1: none)
+#
+# With shared=True the table is also published to a multiprocessing.shared_memory
+# block that another process (the live viewer) can read:
+#
+#   header  seq uint64 | time float64 | rate float64 | count uint64
+#   data    pos[count] | speed[count] | rsu[count]
+#
+# publish() copies the working arrays into the block under a sequence lock: seq
+# is odd while the copy is in progress and even once it is complete, so a reader
+# that sees the same even seq before and after its own copy holds a consistent
+# snapshot of one simulated instant. There is one writer; readers never block it.
+# (The stores are plain memory writes, which x86 keeps in program order.)
+#
+# `rate` goes the other way: the viewer sets how many simulated seconds may pass
+# per wall-clock second (inf: as fast as possible, 0: paused), and
+# state_publisher() sleeps accordingly.
+
+SEQ, TIME, RATE, COUNT = 0, 1, 2, 3
+HEADER_SIZE = 32
+
+Snapshot = namedtuple("Snapshot", "seq time pos speed rsu")
+
+
+def _layout(count):
+    """Byte offsets of pos, speed and rsu, and the total block size."""
+    pos = HEADER_SIZE
+    speed = pos + 8 * count
+    rsu = speed + 8 * count
+    return pos, speed, rsu, rsu + 4 * count
+
+
+class VehicleStateTable:
+    """Per-vehicle position, speed and covering RSU, written in place by the simulation."""
+
+    def __init__(self, count, shared=False):
+        self.count = count
+        self.pos = array("d", [math.nan]) * count
+        self.speed = array("d", bytes(8 * count))
+        self.rsu = array("i", [-1]) * count
+        self.time = 0.0
+        self.shm = None
+        if shared:
+            pos, speed, rsu, size = _layout(count)
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            buf = self.shm.buf
+            self._seq = buf[0:8].cast("Q")
+            self._header = buf[0:HEADER_SIZE].cast("d")
+            self._seq[0] = 0
+            self._header[TIME] = 0.0
+            self._header[RATE] = math.inf
+            buf[HEADER_SIZE - 8:HEADER_SIZE].cast("Q")[0] = count
+            self._views = (buf[pos:speed].cast("d"), buf[speed:rsu].cast("d"), buf[rsu:size].cast("i"))
+            self.publish(0.0)
+
+    @property
+    def name(self):
+        """Name of the shared block (pass it to StateTableReader), None if not shared."""
+        return self.shm.name if self.shm else None
+
+    @property
+    def rate(self):
+        """Simulated seconds per wall-clock second the viewer asks for (inf if not shared)."""
+        return self._header[RATE] if self.shm else math.inf
+
+    def set(self, vid, pos, speed, covering=()):
+        """Records a vehicle's position and speed; covering: the RSUs covering pos."""
+        self.pos[vid] = pos
+        self.speed[vid] = speed
+        self.rsu[vid] = covering[0] if covering else -1
+
+    def publish(self, now):
+        """Makes the current arrays the snapshot for simulated time `now`."""
+        self.time = now
+        if self.shm is None:
+            return
+        seq = self._seq[0]
+        self._seq[0] = seq + 1
+        pos, speed, rsu = self._views
+        pos[:] = self.pos
+        speed[:] = self.speed
+        rsu[:] = self.rsu
+        self._header[TIME] = now
+        self._seq[0] = seq + 2
+
+    def close(self):
+        """Releases the shared block (readers that are still attached keep their mapping)."""
+        if self.shm is not None:
+            views, self._views, self._seq, self._header = self._views, None, None, None
+            for view in views:
+                view.release()
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class StateTableReader:
+    """Reads consistent snapshots of a VehicleStateTable published by another process."""
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        buf = self.shm.buf
+        self._seq = buf[0:8].cast("Q")
+        self._header = buf[0:HEADER_SIZE].cast("d")
+        self.count = buf[HEADER_SIZE - 8:HEADER_SIZE].cast("Q")[0]
+        self._layout = _layout(self.count)
+        self._data = buf[HEADER_SIZE:self._layout[3]]
+
+    @property
+    def seq(self):
+        return self._seq[0]
+
+    def set_rate(self, rate):
+        """Asks the simulation to run at `rate` simulated seconds per second (0: pause)."""
+        self._header[RATE] = rate
+
+    def snapshot(self):
+        """The latest complete Snapshot; retries while the writer is mid-publish."""
+        while True:
+            seq = self._seq[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            data = bytes(self._data)
+            now = self._header[TIME]
+            if self._seq[0] == seq:
+                break
+        pos, speed, rsu, size = (offset - HEADER_SIZE for offset in self._layout)
+        view = memoryview(data)
+        return Snapshot(seq, now, view[pos:speed].cast("d"), view[speed:rsu].cast("d"), view[rsu:size].cast("i"))
+
+    def close(self):
+        self._seq.release()
+        self._header.release()
+        self._data.release()
+        self.shm.close()
+
+
+def state_publisher(env, table, interval, trajectories=None, coverage=None):
+    """SimPy process publishing the table every `interval` simulated seconds.
+
+    Each publish waits behind everything already scheduled for its instant, so
+    it sees every vehicle that moves then. With trajectories (event-driven
+    mobility's {vid: {"pos", "speed", "since"}}) the positions are sampled from
+    them first. A shared table is paced to the viewer's rate.
+    """
+    wall, sim = time.perf_counter(), env.now
+    rate = table.rate
+    while True:
+        yield env.timeout(0)
+        if trajectories is not None:
+            now = env.now
+            for vid, state in trajectories.items():
+                if state is not None:
+                    x = state["pos"] + state["speed"] * (now - state["since"])
+                    table.set(vid, x, state["speed"], coverage.covering(x))
+        table.publish(env.now)
+
+        # Sleep until the wall clock catches up with the viewer's rate; re-anchor on a change
+        while table.rate != rate or rate == 0:
+            if table.rate != rate:
+                wall, sim, rate = time.perf_counter(), env.now, table.rate
+            if rate == 0:
+                time.sleep(0.05)
+        if rate != math.inf:
+            ahead = (env.now - sim) / rate - (time.perf_counter() - wall)
+            if ahead > 0:
+                time.sleep(ahead)
+        yield env.timeout(interval)
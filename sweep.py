@@ -0,0 +1,162 @@
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from statistics import mean, pstdev
+
+import yaml
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main as run_sim
+
+# ------------ Monte Carlo / parameter sweep runner (headless) ------------
+# Fans (parameter point, seed) runs out over a process pool. Each run gets its
+# own seeded RNG and sends back only a compact summary, never its event log.
+#
+#   python sweep.py --param vehicles.count=10,50,100 --param rsus.broadcast_interval=1,5 --seeds 100
+#   python sweep.py --param rsus.broadcast_interval=1,5,10 --seeds 20 --warmup 300
+
+
+class RunSummary:
+    """Event sink for one run that keeps counts and the SIM_END logs (and profile) only."""
+
+    # The only events a run builds: per-step moves and V2V receptions are skipped
+    TYPES = ("SIM_END", "VEHICLE_WAIT_START", "RSU_GLOBAL_BROADCAST",
+             "GLOBAL_RSU_BROADCAST_RECEIVE", "RSU_ACK_RECEIVED")
+
+    def __init__(self):
+        self.counts = Counter()
+        self.rsu_log = []
+        self.wait_log = {}
+        self.profile = None
+
+    def put(self, event):
+        self.counts[event["type"]] += 1
+        if event["type"] == "SIM_END":
+            self.rsu_log = event["rsu_log"]
+            self.wait_log = event["wait_log"]
+            self.profile = event.get("profile")
+
+    def result(self):
+        """Event counts plus wait, RSU dwell and ACK statistics of the run."""
+        counts = self.counts
+        acks_sent = counts["GLOBAL_RSU_BROADCAST_RECEIVE"]
+        dwell = [r["departure"] - r["arrival"] for r in self.rsu_log if r["arrival"] is not None]
+        result = {
+            "events": dict(counts),
+            "wait": distribution(self.wait_log.values()),
+            "rsu_dwell": distribution(dwell),
+            "ack_ratio": counts["RSU_ACK_RECEIVED"] / acks_sent if acks_sent else None,
+        }
+        if self.profile:
+            result["profile"] = self.profile
+        return result
+
+
+def set_param(config, key, value):
+    """Sets a dotted key such as "vehicles.count" in a nested config dict."""
+    *parents, leaf = key.split(".")
+    for p in parents:
+        config = config[p]
+    config[leaf] = value
+
+
+def expand_grid(grid):
+    """{"a.b": [1, 2], "c": [3]} -> [{"a.b": 1, "c": 3}, {"a.b": 2, "c": 3}]"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def distribution(values):
+    values = sorted(values)
+    if not values:
+        return {"n": 0}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"n": len(values), "mean": mean(values), "std": pstdev(values),
+            "min": values[0], "p50": pick(0.5), "p90": pick(0.9), "max": values[-1]}
+
+
+def run_one(base_config, params, seed, checkpoint=None):
+    # checkpoint: continue this seed's warm-up (its RNG included) instead of starting at 0
+    config = copy.deepcopy(base_config)
+    for key, value in params.items():
+        set_param(config, key, value)
+    summary = RunSummary()
+    run_sim(EventLogger(summary, RunSummary.TYPES), config, None if checkpoint else seed, checkpoint=checkpoint)
+    return {"params": params, "seed": seed, **summary.result()}
+
+
+def _run_job(job):
+    return run_one(*job)
+
+
+def _warm_up_job(job):
+    from checkpoint import warm_up
+    return warm_up(*job)
+
+
+def sweep(base_config, grid, seeds=10, workers=None, warmup=None):
+    """Runs every grid point for every seed; returns the run summaries in grid order.
+
+    seeds is a count (seeds 0..n-1) or an explicit list of seeds. Every grid
+    point uses the same seeds, so points are compared on common random numbers.
+    With warmup (simulated seconds), each seed runs the base config up to then
+    once and every grid point forks from that checkpoint (see checkpoint.py):
+    event counts then cover the forked part only, the SIM_END logs the whole run.
+    Grid keys a fork cannot change (checkpoint.FIXED_AT_FORK) raise ValueError
+    before anything runs.
+    """
+    if warmup:
+        from checkpoint import check_fork_params
+        check_fork_params(base_config, grid, warmup)
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        checkpoints = dict.fromkeys(seeds)
+        if warmup:
+            warm = pool.map(_warm_up_job, [(base_config, warmup, seed) for seed in seeds])
+            checkpoints = dict(zip(seeds, warm))
+        jobs = [(base_config, params, seed, checkpoints[seed]) for params in expand_grid(grid) for seed in seeds]
+        return list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def parse_param(text):
+    key, _, values = text.partition("=")
+    if not key or not values:
+        raise argparse.ArgumentTypeError(f"expected KEY=V1,V2,... got {text!r}")
+    return key, [yaml.safe_load(v) for v in values.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless parameter sweep / Monte Carlo runner")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="dotted config key and comma-separated values, e.g. vehicles.count=10,50")
+    parser.add_argument("--seeds", type=int, default=10, help="runs per grid point (seeds 0..N-1)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--warmup", type=float, default=None, metavar="SECONDS",
+                        help="warm each seed up to this time once and fork every grid point from there")
+    parser.add_argument("--out", default="sweep_results.jsonl", help="JSON Lines output file")
+    args = parser.parse_args()
+
+    base_config = load_config(args.config)
+    if base_config.get("type") == "FATAL_ERROR":
+        sys.exit(f"{base_config['message']} ({base_config['path']})")
+
+    if args.warmup:
+        from checkpoint import check_fork_params
+        try:
+            check_fork_params(base_config, dict(args.param), args.warmup)
+        except ValueError as e:
+            parser.error(f"--warmup: {e}")
+
+    results = sweep(base_config, dict(args.param), args.seeds, args.workers, args.warmup)
+    with open(args.out, "w") as out:
+        for r in results:
+            out.write(json.dumps(r) + "\n")
+    print(f"Wrote {len(results)} runs to {args.out}")
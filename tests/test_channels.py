@@ -0,0 +1,62 @@
+import random
+
+from channels import MessageStore, V2VChannel
+
+
+def test_expire_drops_only_messages_older_than_ttl():
+    store = MessageStore(ttl=5)
+    for t in range(10):
+        store.append({"time": t})
+    dropped = store.expire(8)
+    assert [msg["time"] for _, msg in dropped] == [0, 1, 2]
+    assert [msg["time"] for msg in store] == list(range(3, 10))
+
+
+def test_expire_runs_once_per_instant():
+    store = MessageStore(ttl=1)
+    store.append({"time": 0})
+    assert store.expire(5) and len(store) == 0
+    store.append({"time": 0})   # appended at the same instant: not expired again until time moves
+    assert store.expire(5) == []
+    assert len(store) == 1
+
+
+def test_since_returns_only_unread_messages():
+    store = MessageStore(ttl=10)
+    store.append({"time": 0, "n": 0})
+    cursor = store.cursor
+    store.append({"time": 1, "n": 1})
+    store.append({"time": 2, "n": 2})
+    new, cursor = store.since(cursor)
+    assert [m["n"] for m in new] == [1, 2]
+    assert store.since(cursor) == ([], cursor)
+
+
+def test_since_skips_expired_messages():
+    store = MessageStore(ttl=2)
+    for t in range(6):
+        store.append({"time": t})
+    store.expire(5)
+    new, _ = store.since(0)
+    assert [m["time"] for m in new] == [3, 4, 5]
+
+
+def test_nearby_matches_a_full_scan_in_send_order():
+    rng = random.Random(7)
+    cell = 120
+    channel = V2VChannel(cell, ttl=5)
+    sent = []
+    for t in range(30):
+        for _ in range(40):
+            # A quarter of the messages sit exactly on a cell boundary
+            pos = cell * rng.randrange(0, 20) if rng.random() < 0.25 else rng.uniform(0, 2400)
+            msg = {"time": t, "pos": pos, "from": len(sent)}
+            channel.append(msg)
+            sent.append(msg)
+        channel.expire(t)
+        live = [m for m in sent if m["time"] >= t - 5]
+        for _ in range(50):
+            pos = cell * rng.randrange(0, 20) if rng.random() < 0.25 else rng.uniform(-100, 2500)
+            reach = rng.choice([cell, cell / 2, 2.5 * cell, rng.uniform(0, 3 * cell)])
+            expected = [m for m in live if abs(pos - m["pos"]) <= reach]
+            assert list(channel.nearby(pos, reach)) == expected, (t, pos, reach)
@@ -0,0 +1,49 @@
+import copy
+import pickle
+
+import pytest
+
+from checkpoint import check_fork_params, warm_up
+from main import DEFAULT_CONFIG, load_config, main
+
+
+class ListSink(list):
+    def put(self, event):
+        self.append(event)
+
+
+@pytest.fixture
+def config():
+    config = load_config(DEFAULT_CONFIG)
+    config["vehicles"]["count"], config["simulation_time"] = 20, 200
+    return config
+
+
+def test_restored_run_continues_the_uninterrupted_one(config):
+    full = ListSink()
+    main(full, copy.deepcopy(config), seed=3)
+
+    warm = ListSink()
+    checkpoint = pickle.loads(pickle.dumps(warm_up(config, 80, seed=3, log_queue=warm)))
+    rest = ListSink()
+    main(rest, copy.deepcopy(config), checkpoint=checkpoint)
+    assert warm + rest == full
+
+    again = ListSink()   # the checkpoint itself is untouched, so it forks again
+    main(again, copy.deepcopy(config), checkpoint=checkpoint)
+    assert again == rest
+
+
+def test_restore_rejects_a_changed_vehicle_count(config):
+    checkpoint = warm_up(config, 50, seed=1)
+    config["vehicles"]["count"] += 1
+    with pytest.raises(ValueError):
+        checkpoint.restore(config)
+
+
+def test_fork_params_are_checked_before_any_warm_up(config):
+    check_fork_params(config, {"rsus.broadcast_interval": [1, 5]}, 50)
+    for grid in ({"vehicles.count": [5, 10]}, {"rsus.sites": [[]]}, {"vehicles": [{}]},
+                 {"simulation_time": [40, 300]}):
+        with pytest.raises(ValueError):
+            check_fork_params(config, grid, 50)
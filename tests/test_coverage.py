@@ -0,0 +1,53 @@
+import bisect
+import random
+
+from coverage import CoverageIndex, rsu_sites
+
+
+def brute_covering(sites, x):
+    return tuple(s["id"] for s in sites if s["position"] <= x <= s["position"] + s["range"])
+
+
+def test_covering_matches_a_scan_of_every_site():
+    rng = random.Random(1)
+    sites = [{"id": i, "position": rng.randrange(0, 2000), "range": rng.randrange(1, 400)} for i in range(50)]
+    index = CoverageIndex(sites)
+    points = [rng.uniform(-100, 2500) for _ in range(2000)]
+    points += [s["position"] for s in sites] + [s["position"] + s["range"] for s in sites]
+    for x in points:
+        assert index.covering(x) == brute_covering(sites, x), x
+
+
+def test_members_follow_placed_vehicles():
+    index = CoverageIndex([{"id": 0, "position": 0, "range": 100}, {"id": 1, "position": 50, "range": 100}])
+    assert index.place(7, 75) == (0, 1)
+    assert index.members(0) == {7} and index.members(1) == {7}
+    assert index.place(7, 120) == (1,)
+    assert index.members(0) == set() and index.members(1) == {7}
+    index.remove(7)
+    assert index.members(1) == set()
+
+
+def test_next_edge():
+    index = CoverageIndex([{"id": 0, "position": 100, "range": 200}])
+    assert index.next_edge(0) == 100
+    assert index.next_edge(100) == 300
+    assert index.next_edge(300) is None
+
+
+def test_sites_default_to_the_shared_range():
+    config = {"rsus": {"range": 200, "sites": [{"position": 100}, {"position": 1500, "range": 300}]}}
+    assert rsu_sites(config) == [{"id": 0, "position": 100, "range": 200},
+                                 {"id": 1, "position": 1500, "range": 300}]
+
+
+def test_slots_match_covering():
+    rng = random.Random(2)
+    sites = [{"id": i, "position": rng.randrange(0, 2000), "range": rng.randrange(1, 400)} for i in range(50)]
+    index = CoverageIndex(sites)
+    offsets, rids = index.slots()
+    points = [rng.uniform(-100, 2500) for _ in range(500)] + index.bounds
+    for x in points:
+        j = bisect.bisect_right(index.bounds, x)
+        slot = 2 * j - (j > 0 and index.bounds[j - 1] == x)
+        assert tuple(rids[offsets[slot]:offsets[slot + 1]]) == brute_covering(sites, x), x
@@ -0,0 +1,22 @@
+import copy
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main
+
+
+class ListSink(list):
+    def put(self, event):
+        self.append(event)
+
+
+def test_vehicles_with_speed_zero_stay_put():
+    config = load_config(DEFAULT_CONFIG)
+    config["mobility"] = "event_driven"
+    config["vehicles"].update(count=20, min_speed=0, max_speed=1)
+    config["rsus"]["position"] = 0       # parked vehicles start inside the RSU's range
+    events = ListSink()
+    main(EventLogger(events, "verbose"), copy.deepcopy(config), seed=2)
+    assert events[-1]["type"] == "SIM_END"
+    parked = {e["vid"] for e in events if e["type"] == "VEHICLE_MOVE" and e["pos"] == 0.0 and e["time"] > 10}
+    assert parked
+    assert any(e["type"] == "GLOBAL_RSU_BROADCAST_RECEIVE" and e["to_vid"] in parked for e in events)
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main
+
+np = pytest.importorskip("numpy")
+from eventlog import EventLogReader, EventLogWriter  # noqa: E402
+
+
+class ListSink(list):
+    def put(self, event):
+        self.append(event)
+
+
+def normalized(event):
+    # Replay gives ints and floats back as JSON would (tuples as lists, 3 == 3.0)
+    return json.loads(json.dumps(event))
+
+
+def record(tmp_path, config, seed=3):
+    events = ListSink()
+    with EventLogWriter(tmp_path / "log", forward=events) as writer:
+        main(EventLogger(writer, "verbose"), config, seed)
+    return events, EventLogReader(tmp_path / "log")
+
+
+def test_round_trip_gives_back_every_event(tmp_path):
+    config = load_config(DEFAULT_CONFIG)
+    config["vehicles"]["count"], config["simulation_time"] = 10, 60
+    events, reader = record(tmp_path, config)
+    assert len(reader) == len(events)
+    for i, event in enumerate(events):
+        assert reader.event(i) == normalized(event), i
+
+
+def test_time_search(tmp_path):
+    config = load_config(DEFAULT_CONFIG)
+    config["vehicles"]["count"], config["simulation_time"] = 10, 60
+    events, reader = record(tmp_path, config)
+    times = [e.get("time") for e in events if "time" in e]
+    assert reader.index_at(30) == sum(1 for t in times if t < 30)
+    assert reader.index_after(30) == sum(1 for t in times if t <= 30)
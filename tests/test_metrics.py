@@ -0,0 +1,86 @@
+import math
+import random
+from statistics import mean, pstdev
+
+import pytest
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main
+from metrics import Histogram, OnlineMetrics, RunningStats, WindowedRate
+from sweep import RunSummary
+
+
+def test_running_stats_match_a_batch_computation():
+    rng = random.Random(2)
+    values = [rng.uniform(-5, 50) for _ in range(1000)]
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.n == len(values)
+    assert stats.mean == pytest.approx(mean(values))
+    assert math.sqrt(stats.variance) == pytest.approx(pstdev(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_histogram_buckets_with_under_and_overflow():
+    hist = Histogram([0, 10, 20])
+    for x in (-1, 0, 5, 10, 19.9, 20, 100):
+        hist.add(x)
+    assert hist.counts == [1, 2, 2, 2]
+
+
+def test_windowed_rate_forgets_old_slices():
+    rate = WindowedRate(10, buckets=10)
+    rate.add(0.5, 20)
+    assert rate.rate(5) == 2.0
+    rate.add(12.0, 5)
+    assert rate.rate(12.0) == 0.5
+
+
+class Both:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def put(self, event):
+        for sink in self.sinks:
+            sink.put(event)
+
+
+def test_online_metrics_agree_with_the_run_summary():
+    config = load_config(DEFAULT_CONFIG)
+    config["vehicles"]["count"], config["simulation_time"] = 30, 200
+    metrics, summary = OnlineMetrics(interval=50), RunSummary()
+    main(EventLogger(Both(metrics, summary), OnlineMetrics.TYPES), config, 4)
+
+    result, expected = metrics.result(), summary.result()
+    for event_type in RunSummary.TYPES:
+        assert result["events"].get(event_type) == expected["events"].get(event_type)
+    assert result["wait"]["n"] == expected["events"].get("VEHICLE_WAIT_START", 0)
+    # One row per interval, then the final one at SIM_END (the time of the last event)
+    assert [row["time"] for row in metrics.rows[:-1]] == [50, 100, 150]
+    assert 150 < metrics.rows[-1]["time"] <= 200
+    last = metrics.rows[-1]
+    assert last["acks_received"] == expected["events"].get("RSU_ACK_RECEIVED", 0)
+    assert last["ack_ratio"] == pytest.approx(expected["ack_ratio"])
+
+
+def test_csv_export(tmp_path):
+    metrics = OnlineMetrics(interval=1)
+    for t in range(3):
+        metrics.put({"type": "V2V_RECEIVE", "time": t + 0.5})
+    metrics.put({"type": "SIM_END"})
+    metrics.export(tmp_path / "metrics.csv")
+    lines = (tmp_path / "metrics.csv").read_text().splitlines()
+    assert lines[0].startswith("time,v2v_received,")
+    assert [line.split(",")[1] for line in lines[1:]] == ["1", "2", "3"]
+
+
+def test_acks_are_paired_with_their_broadcast_by_seq():
+    metrics = OnlineMetrics(interval=0)
+    # Two broadcasts within one second share a broadcast_id string
+    for seq, connected in ((0, 4), (1, 2)):
+        metrics.put({"type": "RSU_GLOBAL_BROADCAST", "time": 1.0 + seq / 2, "from": 0, "seq": seq,
+                     "broadcast_id": "RSU0_BCAST_1", "connected_count": connected, "avg_wait": 0})
+    metrics.put({"type": "RSU_BROADCAST_ACK_SUMMARY", "time": 2.0, "rid": 0, "seq": 1,
+                 "broadcast_id": "RSU0_BCAST_1", "ack_count": 1})
+    assert metrics.ack_ratio.n == 1 and metrics.ack_ratio.mean == 0.5
@@ -0,0 +1,68 @@
+import copy
+import multiprocessing
+
+import pytest
+
+from events import EventLogger
+from main import DEFAULT_CONFIG, load_config, main
+from partitioned import _RemoteSegment
+
+
+class ListSink(list):
+    def put(self, event):
+        self.append(event)
+
+
+@pytest.fixture
+def config():
+    config = load_config(DEFAULT_CONFIG)
+    config["engine"] = "partitioned"
+    config["vehicles"]["count"], config["simulation_time"] = 60, 120
+    config["rsus"]["sites"] = [{"position": p} for p in (100, 700, 1300)]
+    config["intersections"]["positions"] = list(range(200, 2000, 200))
+    config["partitioning"] = {"workers": 1, "rebalance_every": 5}
+    return config
+
+
+def run(config, workers, seed=11):
+    config = copy.deepcopy(config)
+    config["partitioning"]["workers"] = workers
+    events = ListSink()
+    main(EventLogger(events, "verbose"), config, seed)
+    return events
+
+
+def test_events_do_not_depend_on_the_worker_count(config):
+    reference = run(config, 1)
+    assert reference[-1]["type"] == "SIM_END"
+    for workers in (2, 3):
+        assert run(config, workers) == reference, workers
+
+
+def test_seed_reproduces_and_varies_the_run(config):
+    assert run(config, 2, seed=5) == run(config, 2, seed=5)
+    assert run(config, 2, seed=5) != run(config, 2, seed=6)
+
+
+def test_a_dead_worker_is_reported_by_segment(config):
+    segment = _RemoteSegment(multiprocessing.get_context("spawn"), config, frozenset(), 1, [], 0)
+    segment.process.kill()
+    segment.process.join()
+    with pytest.raises(RuntimeError, match="segment 0 worker died"):
+        segment.submit("sample", 10)
+        segment.result()
+    segment.close()
+
+
+def test_matches_the_single_process_run_when_nothing_is_random(config):
+    # Partitioned vehicles draw from their own RNG streams, so the runs only agree
+    # event for event when no draw matters: one speed and no intersection waits
+    config["vehicles"]["min_speed"] = config["vehicles"]["max_speed"] = 13
+    config["vehicles"]["intersection_wait_prob"] = 0
+    single = copy.deepcopy(config)
+    single["engine"] = "simpy"
+    reference = ListSink()
+    main(EventLogger(reference, "verbose"), single, 11)
+    assert reference[-1]["type"] == "SIM_END"
+    for workers in (1, 3):
+        assert run(config, workers) == reference, workers
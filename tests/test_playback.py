@@ -0,0 +1,71 @@
+import queue
+import threading
+
+import pytest
+
+import run_simulation
+from run_simulation import Player, QueueEventSource
+
+
+class FakeVisualizer:
+    """Keeps vehicle_states the way SimVisualizer.process_message does, without pygame."""
+    def __init__(self):
+        self.vehicle_states = {}
+        self.changed = False
+
+    def process_message(self, event):
+        if event["type"] == "VEHICLE_MOVE":
+            self.vehicle_states[event["vid"]] = {"pos": event["pos"], "waiting": False}
+
+
+def finished_source(events):
+    log_queue = queue.Queue()
+    for event in events:
+        log_queue.put(event)
+    thread = threading.Thread(target=lambda: None)
+    thread.start()
+    thread.join()
+    return QueueEventSource(log_queue, thread)
+
+
+def moves(count, vehicles=5):
+    events = [{"type": "VEHICLE_MOVE", "time": i * 0.1, "vid": i % vehicles, "pos": float(i)} for i in range(count)]
+    return events + [{"type": "SIM_END"}]
+
+
+def played_to(events, simulation_time):
+    visualizer = FakeVisualizer()
+    for event in events:
+        if event.get("time", 0) <= simulation_time:
+            visualizer.process_message(event)
+    return visualizer.vehicle_states
+
+
+@pytest.fixture(autouse=True)
+def small_keyframes(monkeypatch):
+    monkeypatch.setattr(run_simulation, "KEYFRAME_EVERY", 100)
+
+
+def test_seek_restores_the_state_of_playing_to_that_time():
+    events = moves(3000)
+    player = Player(finished_source(events), FakeVisualizer())
+    player.tick(150)                       # plays through t=150 (1501 events)
+    for t in (120.05, 3.3, 0.0, 149.9, 42.0):
+        player.seek(t)
+        assert player.time == t
+        assert player.visualizer.vehicle_states == played_to(events, t), t
+
+
+def test_live_history_is_bounded_and_older_times_clamp(monkeypatch):
+    monkeypatch.setattr(run_simulation, "HISTORY_EVENTS", 1000)
+    events = moves(5000)
+    source = finished_source(events)
+    player = Player(source, FakeVisualizer())
+    for _ in range(60):
+        player.tick(10)
+    assert player.finished
+    assert len(source.events) <= 1000 + 100 + 1
+    assert min(player.keyframes) * 100 == source.first
+    player.seek(0.0)
+    assert player.time == source.earliest_time > 0
+    assert player.visualizer.vehicle_states == played_to(events, player.time)
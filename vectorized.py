@@ -0,0 +1,273 @@
+import numpy as np
+
+from channels import BroadcastRegister, RsuMailboxes
+from coverage import CoverageIndex, rsu_sites
+from rsuround import rsu_round
+from simstate import RsuState
+
+# ------------ Vectorized Engine (all vehicles advanced as NumPy arrays) ------------
+# Opt-in alternative to one SimPy process per vehicle (`engine: vectorized` in the
+# scenario). Vehicles and RSUs follow the same rules as main.vehicle() / main.rsu()
+# and emit the same event types, but every time step is one set of array
+# operations over all vehicles. Vehicles stay on the time_step grid: a wait that
+# ends between two steps resumes at the next step.
+
+WAIT_START, WAIT_END = 0, 1
+V2V_TYPES = ("WAIT_START", "WAIT_END")
+
+
+class VectorizedSim:
+    def __init__(self, config, logger, rng=None):
+        self.config = config
+        self.logger = logger
+        self.log_move = logger.wants("VEHICLE_MOVE")
+        self.log_v2v = logger.wants("V2V_RECEIVE")
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        vcfg = config["vehicles"]
+        n = vcfg["count"]
+        self.n = n
+        self.dt = config["time_step"]
+        self.v2v_range = vcfg["v2v_range"]
+        self.v2v_ttl = vcfg.get("v2v_message_ttl", 5)
+        self.wait_prob = vcfg["intersection_wait_prob"]
+        self.wait_min = vcfg["intersection_wait_min"]
+        self.wait_max = vcfg["intersection_wait_max"]
+        self.intersections = np.sort(np.asarray(config["intersections"]["positions"], dtype=float))
+
+        # Vehicle state (struct of arrays, indexed by vid)
+        self.pos = np.zeros(n)
+        self.speed = self.rng.integers(vcfg["min_speed"], vcfg["max_speed"] + 1, size=n).astype(float)
+        self.total_wait = np.zeros(n, dtype=np.int64)
+        self.resume_at = np.full(n, -np.inf)   # > now while waiting at an intersection
+        self.waiting = np.zeros(n, dtype=bool)
+        self.seen = np.zeros(n, dtype=bool)     # vehicles_state[vid] is not None
+
+        # RSUs (placed as in main.main(), see coverage.rsu_sites). The RSUs covering a
+        # position come from the coverage index's precomputed slots: one searchsorted
+        # over the interval end points, so the cost does not grow with the RSU count.
+        sites = rsu_sites(config)
+        r = len(sites)
+        self.r = r
+        self.interval = config["rsus"]["broadcast_interval"]
+        coverage = CoverageIndex(sites)
+        offsets, rids = coverage.slots()
+        self.bounds = np.asarray(coverage.bounds, dtype=float)
+        self.slot_offsets = np.asarray(offsets, dtype=np.int64)
+        self.slot_rids = np.asarray(rids, dtype=np.int64)
+        # (RSU, vehicle) pairs are keyed rid * n + vid: sorted keys group by RSU, then vehicle.
+        # Vehicle side: the pairs a vehicle is inside, with the last broadcast seq it took there.
+        # Vehicles only move forward, so a pair it has left never comes back and is dropped.
+        self.inside = np.empty(0, dtype=np.int64)
+        self.inside_seen = np.empty(0, dtype=np.int64)
+        # RSU side: each RSU's connected vehicles and table, as in main.rsu()
+        self.rsus = [RsuState() for _ in range(r)]
+        self.broadcasts = [BroadcastRegister() for _ in range(r)]
+        self.bcast_seq = np.full(r, -1, dtype=np.int64)  # latest broadcast seq per RSU
+        self.mailboxes = RsuMailboxes()
+
+        # Live V2V messages as columns, in send (time) order
+        self.m_time = np.empty(0)
+        self.m_pos = np.empty(0)
+        self.m_from = np.empty(0, dtype=np.int64)
+        self.m_type = np.empty(0, dtype=np.int8)
+        self.m_wait = np.empty(0, dtype=np.int64)
+
+        self.rsu_log = []
+
+    # ---- helpers ----
+    def _covering(self, vids):
+        """Sorted keys (rid * n + vid) of the RSUs in direct range of each of `vids`."""
+        if not self.r or not len(vids):
+            return np.empty(0, dtype=np.int64)
+        pos = self.pos[vids]
+        # Slot of each position (see CoverageIndex.slots): on an end point or between two
+        idx = np.searchsorted(self.bounds, pos, side="right")
+        on_bound = (idx > 0) & (self.bounds[np.maximum(idx - 1, 0)] == pos)
+        slot = 2 * idx - on_bound
+        start = self.slot_offsets[slot]
+        counts = self.slot_offsets[slot + 1] - start
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        first = np.cumsum(counts) - counts
+        rids = self.slot_rids[np.repeat(start - first, counts) + np.arange(total)]
+        keys = rids * self.n + np.repeat(vids, counts)
+        keys.sort()
+        return keys
+
+    def _send_v2v(self, now, vids, msg_type, waits):
+        k = len(vids)
+        if not k:
+            return
+        self.m_time = np.concatenate([self.m_time, np.full(k, now)])
+        self.m_pos = np.concatenate([self.m_pos, self.pos[vids]])
+        self.m_from = np.concatenate([self.m_from, vids])
+        self.m_type = np.concatenate([self.m_type, np.full(k, msg_type, dtype=np.int8)])
+        self.m_wait = np.concatenate([self.m_wait, waits])
+
+    def _expire_v2v(self, now):
+        k = np.searchsorted(self.m_time, now - self.v2v_ttl, side="left")
+        if k:
+            self.m_time, self.m_pos = self.m_time[k:], self.m_pos[k:]
+            self.m_from, self.m_type, self.m_wait = self.m_from[k:], self.m_type[k:], self.m_wait[k:]
+
+    def _send_wait_updates(self, now, vids, waits):
+        wait_of = dict(zip(vids.tolist(), waits.tolist()))
+        for key in self._covering(vids).tolist():
+            rid, vid = divmod(key, self.n)
+            self.mailboxes.send_v2r(rid, {"type": "WAIT_UPDATE", "from": vid, "time": now,
+                                          "pos": self.pos[vid].item(), "wait": wait_of[vid]})
+
+    # ---- vehicles: one time step for all of them ----
+    def vehicle_step(self, now):
+        put = self.logger.put
+        resumed = self.waiting & (self.resume_at <= now)
+        if resumed.any():
+            vids = np.flatnonzero(resumed)
+            self.waiting[vids] = False
+            self._send_v2v(now, vids, WAIT_END, self.total_wait[vids])
+            self._send_wait_updates(now, vids, self.total_wait[vids])
+
+        # Intersection crossings: first intersection in (pos, pos + speed]
+        regular = ~self.waiting & ~resumed
+        new_waiters = np.zeros(self.n, dtype=bool)
+        if len(self.intersections):
+            idx = np.searchsorted(self.intersections, self.pos, side="right")
+            has_next = idx < len(self.intersections)
+            nxt = self.intersections[np.minimum(idx, len(self.intersections) - 1)]
+            crossing = regular & has_next & (nxt <= self.pos + self.speed)
+            self.pos[crossing] = nxt[crossing]
+            cvids = np.flatnonzero(crossing)
+            stops = self.rng.random(len(cvids)) < self.wait_prob
+            wvids = cvids[stops]
+            if len(wvids):
+                waits = self.rng.integers(self.wait_min, self.wait_max + 1, size=len(wvids))
+                if self.logger.wants("VEHICLE_WAIT_START"):
+                    for vid, pos, w in zip(wvids.tolist(), self.pos[wvids].tolist(), waits.tolist()):
+                        put({"type": "VEHICLE_WAIT_START", "time": now, "vid": vid, "pos": pos, "wait_time": w})
+                announced = self.total_wait[wvids] + waits
+                self._send_v2v(now, wvids, WAIT_START, announced)
+                self._send_wait_updates(now, wvids, announced)
+                self.total_wait[wvids] = announced
+                self.resume_at[wvids] = now + waits
+                self.waiting[wvids] = True
+                new_waiters[wvids] = True
+        self.seen |= regular
+
+        movers = np.flatnonzero((regular & ~new_waiters) | resumed)
+        self.pos[movers] += self.speed[movers]
+        if self.log_move:
+            for vid, pos in zip(movers.tolist(), self.pos[movers].tolist()):
+                put({"type": "VEHICLE_MOVE", "time": now, "vid": vid, "pos": pos})
+
+        self._expire_v2v(now)
+        if self.log_v2v:
+            self._v2v_receive(now, movers)
+        self._direct_rsu(now, movers)
+        self._broadcast_receive(now, movers)
+
+    def _v2v_receive(self, now, movers):
+        if not len(self.m_time) or not len(movers):
+            return
+        order = np.argsort(self.pos[movers], kind="stable")
+        sorted_vids = movers[order]
+        sorted_pos = self.pos[sorted_vids]
+        lo = np.searchsorted(sorted_pos, self.m_pos - self.v2v_range, side="left")
+        hi = np.searchsorted(sorted_pos, self.m_pos + self.v2v_range, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            return
+        msg = np.repeat(np.arange(len(counts)), counts)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        recv = sorted_vids[np.arange(total) + starts]
+        keep = (recv != self.m_from[msg]) & (np.abs(self.pos[recv] - self.m_pos[msg]) <= self.v2v_range)
+        msg, recv = msg[keep], recv[keep]
+        pairs = np.lexsort((msg, recv))  # per receiver, messages in send order
+        put = self.logger.put
+        for to, frm, mtype, wait in zip(recv[pairs].tolist(), self.m_from[msg[pairs]].tolist(),
+                                        self.m_type[msg[pairs]].tolist(), self.m_wait[msg[pairs]].tolist()):
+            status = "free" if wait == 0 else f"delayed {wait}s"
+            put({"type": "V2V_RECEIVE", "time": now, "from": frm, "to": to,
+                 "msg_type": V2V_TYPES[mtype], "status": status})
+
+    def _direct_rsu(self, now, movers):
+        put = self.logger.put
+        n = self.n
+        new = self._covering(movers)
+        mine = np.isin(self.inside % n, movers)
+        old, old_seen = self.inside[mine], self.inside_seen[mine]
+        left = np.setdiff1d(old, new, assume_unique=True)
+        entered = np.setdiff1d(new, old, assume_unique=True)
+        # Per RSU the leaves, then the enters, each by vid
+        changes = np.concatenate([left, entered])
+        enters = np.concatenate([np.zeros(len(left), dtype=bool), np.ones(len(entered), dtype=bool)])
+        order = np.lexsort((changes % n, enters, changes // n))
+        for key, enter in zip(changes[order].tolist(), enters[order].tolist()):
+            rid, vid = divmod(key, n)
+            event, msg_type = ("RSU_ENTER", "HELLO") if enter else ("RSU_LEAVE", "BYE")
+            pos, wait = self.pos[vid].item(), self.total_wait[vid].item()
+            if self.logger.wants(event):
+                put({"type": event, "time": now, "vid": vid, "pos": pos, "rid": rid})
+            self.mailboxes.send_v2r(rid, {"type": msg_type, "from": vid, "time": now, "pos": pos,
+                                          "wait": wait, "to_rid": rid})
+        # Pairs still inside keep the seq they have seen; new ones have seen nothing
+        seen = np.full(len(new), -1, dtype=np.int64)
+        kept = np.isin(new, old, assume_unique=True)
+        seen[kept] = old_seen[np.searchsorted(old, new[kept])]
+        inside = np.concatenate([self.inside[~mine], new])
+        order = np.argsort(inside, kind="stable")
+        self.inside = inside[order]
+        self.inside_seen = np.concatenate([self.inside_seen[~mine], seen])[order]
+
+    def _broadcast_receive(self, now, movers):
+        put = self.logger.put
+        log_receive = self.logger.wants("GLOBAL_RSU_BROADCAST_RECEIVE")
+        mine = np.flatnonzero(np.isin(self.inside % self.n, movers))
+        latest = self.bcast_seq[self.inside[mine] // self.n]
+        fresh = latest > self.inside_seen[mine]
+        for key in self.inside[mine[fresh]].tolist():
+            rid, vid = divmod(key, self.n)
+            bcast = self.broadcasts[rid].latest
+            if log_receive:
+                put({"type": "GLOBAL_RSU_BROADCAST_RECEIVE", "time": now, "to_vid": vid, "from_rid": rid,
+                     "broadcast_time": bcast["time"], "avg_wait": bcast["avg_wait"]})
+            self.mailboxes.send_ack(rid, {"type": "ACK", "from_vid": vid, "time": now, "to_rid": rid,
+                                          "seq": bcast["seq"]})
+        self.inside_seen[mine[fresh]] = latest[fresh]
+
+    # ---- RSUs: one broadcast round for all of them ----
+    def rsu_step(self, now):
+        put = self.logger.put
+        wants = self.logger.wants
+        # Every vehicle that has moved, by the RSU covering it (sorted keys, sliced per RSU)
+        keys = self._covering(np.flatnonzero(self.seen))
+        starts = np.searchsorted(keys, np.arange(self.r + 1) * self.n).tolist()
+        vids_by_key = (keys % self.n).tolist()
+        for rid in range(self.r):
+            in_range = set(vids_by_key[starts[rid]:starts[rid + 1]])
+            self.bcast_seq[rid] = rsu_round(rid, now, in_range, self.rsus[rid], self.broadcasts[rid],
+                                            self.mailboxes, put, wants, self.rsu_log.append)
+
+    def run(self):
+        # Two clocks: vehicle steps every time_step, RSU rounds every broadcast_interval.
+        # On a tie the RSUs go first, as their SimPy timeouts are scheduled earlier.
+        until = self.config["simulation_time"]
+        k = j = 0
+        while True:
+            t_step, t_bcast = k * self.dt, j * self.interval
+            if min(t_step, t_bcast) >= until:
+                break
+            if t_bcast <= t_step:
+                self.rsu_step(t_bcast)
+                j += 1
+            else:
+                self.vehicle_step(t_step)
+                k += 1
+        wait_log = dict(enumerate(self.total_wait.tolist()))
+        self.logger.put({"type": "SIM_END", "rsu_log": self.rsu_log, "wait_log": wait_log})
+
+
+def run_vectorized(config, logger, rng=None):
+    VectorizedSim(config, logger, rng).run()
@@ -1,64 +1,276 @@
+import bisect
 import tkinter as tk
 from tkinter import ttk
 import pygame
 
+from coverage import rsu_sites
+
+def format_details(message):
+    """Builds the 'Details' column text for one log message."""
+    event_type = message.get('type', 'Unknown')
+
+    if event_type == "RSU_GLOBAL_BROADCAST":
+        return (f"RSU {message.get('from')} broadcast_id:{message.get('broadcast_id')}, "
+                f"Connected: {message.get('connected_count')}, "
+                f"Avg Wait: {message.get('avg_wait'):.1f}s")
+    elif event_type == "GLOBAL_RSU_BROADCAST_RECEIVE":
+        return (f"Vehicle {message.get('to_vid')} received RSU {message.get('from_rid')}'s "
+                f"broadcast (time {message.get('broadcast_time'):.1f}s), "
+                f"Avg Wait: {message.get('avg_wait'):.1f}s")
+    elif event_type == "RSU_ACK_RECEIVED":
+        return (f"RSU {message.get('rid')} received ACK from Vehicle {message.get('from_vid')} "
+                f"for broadcast_id: {message.get('broadcast_id')}")
+    elif event_type == "RSU_BROADCAST_ACK_SUMMARY":
+        return (f"RSU {message.get('rid')} broadcast_id:{message.get('broadcast_id')} acknowledged by "
+                f"{message.get('ack_count')} vehicles: {', '.join(map(str, message.get('acknowledged_vids', [])))}")
+    # NEW: Log entry for V2R messages out of range.
+    elif event_type == "RSU_V2R_MESSAGE_OUT_OF_RANGE":
+        return (f"RSU {message.get('rid')} received a {message.get('msg_type')} message from "
+                f"Vehicle {message.get('from_vid')} but vehicle was not connected (likely out of direct V2R range).")
+    # --- END NEW ---
+    elif event_type == "PROFILE":
+        phases = sorted(message.get('phases', {}).items(), key=lambda item: -item[1]["time_s"])
+        return f"last {message.get('interval')}s: " + "; ".join(
+            f"{phase} {stats['time_s'] * 1000:.1f}ms/{stats['calls']}" for phase, stats in phases)
+
+    excluded_keys = ['time', 'type', 'connected_vids']
+    return ", ".join(f"{k}={v}" for k, v in message.items() if k not in excluded_keys)
+
+# Keys naming a vehicle / an RSU, per event; "from" means either depending on the event
+VEHICLE_KEYS = ('vid', 'to', 'to_vid', 'from_vid')
+RSU_KEYS = ('rid', 'from_rid')
+
+def entity_keys(message):
+    """Index keys ('type', t), ('vehicle', id), ('rsu', id) for one message."""
+    event_type = message.get('type', 'Unknown')
+    keys = [('type', event_type)]
+    keys += [('vehicle', message[k]) for k in VEHICLE_KEYS if k in message]
+    keys += [('rsu', message[k]) for k in RSU_KEYS if k in message]
+    if 'from' in message:
+        keys.append(('rsu' if event_type == "RSU_GLOBAL_BROADCAST" else 'vehicle', message['from']))
+    return keys
+
+class LogBuffer:
+    """Bounded ring of log messages with per-type and per-vehicle/RSU indexes.
+
+    Messages get increasing sequence numbers; only the newest `capacity` are
+    kept. Index lists hold sequence numbers in order, so entries that fell out
+    of the ring are trimmed from the front. A filter builds its view from the
+    smallest matching index instead of rescanning every message.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.rows = [None] * capacity
+        self.next_seq = 0
+        self.index = {}          # key -> [offset, seqs]
+        self.filter_keys = ()    # keys a message must all have to be in the view
+        self.view = None         # None: every live message; else [offset, seqs]
+
+    @property
+    def first_seq(self):
+        return max(0, self.next_seq - self.capacity)
+
+    def get(self, seq):
+        return self.rows[seq % self.capacity]
+
+    def append(self, message):
+        seq = self.next_seq
+        self.rows[seq % self.capacity] = message
+        self.next_seq += 1
+        keys = entity_keys(message)
+        for key in keys:
+            self.index.setdefault(key, [0, []])[1].append(seq)
+        if self.view is not None and all(k in keys for k in self.filter_keys):
+            self.view[1].append(seq)
+        if self.next_seq % self.capacity == 0:
+            self._compact()
+
+    def _compact(self):
+        # Once per `capacity` appends: forget index entries that fell out of the ring
+        for key in list(self.index):
+            offset, seqs = self._live(self.index[key])
+            if offset == len(seqs):
+                del self.index[key]
+            elif offset:
+                del seqs[:offset]
+                self.index[key][0] = 0
+
+    def _live(self, entry):
+        # Drops sequence numbers that fell out of the ring; compacts now and then
+        offset, seqs = entry
+        offset = bisect.bisect_left(seqs, self.first_seq, offset)
+        if offset > 4096 and offset * 2 > len(seqs):
+            del seqs[:offset]
+            offset = 0
+        entry[0] = offset
+        return offset, seqs
+
+    def set_filter(self, keys):
+        self.filter_keys = tuple(keys)
+        if not self.filter_keys:
+            self.view = None
+            return
+        entries = [self.index.get(k, [0, []]) for k in self.filter_keys]
+        smallest = min(entries, key=lambda e: len(e[1]) - e[0])
+        offset, seqs = self._live(smallest)
+        view = [q for q in seqs[offset:] if all(k in entity_keys(self.get(q)) for k in self.filter_keys)]
+        self.view = [0, view]
+
+    def __len__(self):
+        if self.view is None:
+            return self.next_seq - self.first_seq
+        offset, seqs = self._live(self.view)
+        return len(seqs) - offset
+
+    def at(self, i):
+        """i-th message of the current view (0 = oldest kept)."""
+        if self.view is None:
+            return self.get(self.first_seq + i)
+        offset, seqs = self.view
+        return self.get(seqs[offset + i])
+
 class LogWindow:
-    def __init__(self, root):
+    """Virtualized log table.
+
+    add_log_entry() only queues a message; refresh() (once per frame) moves
+    the batch into the LogBuffer and redraws just the rows that fit on
+    screen, formatting their details at that moment.
+    """
+    MAX_ROWS = 100_000
+    ROW_HEIGHT = 20
+
+    def __init__(self, root, capacity=MAX_ROWS):
         self.root = root
         self.root.title("Simulation Log")
-        
+        self.buffer = LogBuffer(capacity)
+        self.pending = []
+        self.top = 0             # view index of the first visible row
+        self.follow = True       # keep showing the newest rows
+        self.visible_rows = 20
+        self.dirty = True
+
+        filters = ttk.Frame(root)
+        ttk.Label(filters, text="Type:").pack(side=tk.LEFT)
+        self.type_var = tk.StringVar(value="")
+        self.type_box = ttk.Combobox(filters, textvariable=self.type_var, width=32, values=[""])
+        self.type_box.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filters, text="Vehicle:").pack(side=tk.LEFT)
+        self.vehicle_var = tk.StringVar(value="")
+        ttk.Entry(filters, textvariable=self.vehicle_var, width=8).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filters, text="RSU:").pack(side=tk.LEFT)
+        self.rsu_var = tk.StringVar(value="")
+        ttk.Entry(filters, textvariable=self.rsu_var, width=8).pack(side=tk.LEFT)
+        for var in (self.type_var, self.vehicle_var, self.rsu_var):
+            var.trace_add("write", lambda *_: self.apply_filter())
+
+        ttk.Style(root).configure("Treeview", rowheight=self.ROW_HEIGHT)
         columns = ('time', 'type', 'details')
         self.tree = ttk.Treeview(root, columns=columns, show='headings')
         self.tree.heading('time', text='Time (s)'); self.tree.column('time', width=80, anchor='center')
         self.tree.heading('type', text='Event Type'); self.tree.column('type', width=180) 
         self.tree.heading('details', text='Details'); self.tree.column('details', width=500)
+        self.row_ids = []
         
-        scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL, command=self.on_scrollbar)
         
-        self.tree.grid(row=0, column=0, sticky='nsew')
-        scrollbar.grid(row=0, column=1, sticky='ns')
-        self.root.grid_rowconfigure(0, weight=1); self.root.grid_columnconfigure(0, weight=1)
+        filters.grid(row=0, column=0, columnspan=2, sticky='ew')
+        self.tree.grid(row=1, column=0, sticky='nsew')
+        self.scrollbar.grid(row=1, column=1, sticky='ns')
+        self.root.grid_rowconfigure(1, weight=1); self.root.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
 
     def add_log_entry(self, message):
-        """Processes and displays a single log message."""
+        """Queues a single log message; it is shown on the next refresh()."""
         if not message: return
-        
-        time_val = message.get('time')
-        time_str = f"{time_val:.1f}" if time_val is not None else ""
-        event_type = message.get('type', 'Unknown')
-        
-        details = "" 
-
-        if event_type == "RSU_GLOBAL_BROADCAST":
-            details = (f"RSU {message.get('from')} broadcast_id:{message.get('broadcast_id')}, "
-                       f"Connected: {message.get('connected_count')}, "
-                       f"Avg Wait: {message.get('avg_wait'):.1f}s")
-        elif event_type == "GLOBAL_RSU_BROADCAST_RECEIVE":
-            details = (f"Vehicle {message.get('to_vid')} received RSU {message.get('from_rid')}'s "
-                       f"broadcast (time {message.get('broadcast_time'):.1f}s), "
-                       f"Avg Wait: {message.get('avg_wait'):.1f}s")
-        elif event_type == "RSU_ACK_RECEIVED":
-            details = (f"RSU {message.get('rid')} received ACK from Vehicle {message.get('from_vid')} "
-                       f"for broadcast_id: {message.get('broadcast_id')}")
-        elif event_type == "RSU_BROADCAST_ACK_SUMMARY":
-            details = (f"RSU {message.get('rid')} broadcast_id:{message.get('broadcast_id')} acknowledged by "
-                       f"{message.get('ack_count')} vehicles: {', '.join(map(str, message.get('acknowledged_vids', [])))}")
-        # NEW: Log entry for V2R messages out of range.
-        elif event_type == "RSU_V2R_MESSAGE_OUT_OF_RANGE":
-            details = (f"RSU {message.get('rid')} received a {message.get('msg_type')} message from "
-                       f"Vehicle {message.get('from_vid')} but vehicle was not connected (likely out of direct V2R range).")
-        # --- END NEW ---
-        
-        else: 
-            excluded_keys = ['time', 'type', 'connected_vids'] 
-            details = ", ".join(f"{k}={v}" for k, v in message.items() if k not in excluded_keys)
-        
-        self.tree.insert('', tk.END, values=(time_str, event_type, details))
-        self.tree.yview_moveto(1)
+        self.pending.append(message)
+
+    def refresh(self):
+        """Ingests queued messages and redraws the visible rows (call once per frame)."""
+        if self.pending:
+            known = set(self.type_box['values'])
+            for message in self.pending:
+                self.buffer.append(message)
+                known.add(message.get('type', 'Unknown'))
+            self.pending = []
+            if len(known) != len(self.type_box['values']):
+                self.type_box['values'] = sorted(known)
+            self.dirty = True
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        total = len(self.buffer)
+        if self.follow:
+            self.top = max(0, total - self.visible_rows)
+        self.top = max(0, min(self.top, total - 1))
+        shown = max(0, min(self.visible_rows, total - self.top))
+
+        while len(self.row_ids) < shown:
+            self.row_ids.append(self.tree.insert('', tk.END, values=("", "", "")))
+        while len(self.row_ids) > shown:
+            self.tree.delete(self.row_ids.pop())
+        for row, iid in enumerate(self.row_ids):
+            message = self.buffer.at(self.top + row)
+            time_val = message.get('time')
+            time_str = f"{time_val:.1f}" if time_val is not None else ""
+            self.tree.item(iid, values=(time_str, message.get('type', 'Unknown'), format_details(message)))
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + shown) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        total = len(self.buffer)
+        self.top = max(0, min(self.top + rows, total - self.visible_rows))
+        self.follow = self.top >= total - self.visible_rows
+        self.dirty = True
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(amount) * len(self.buffer)) - self.top)
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.visible_rows if unit == "pages" else 1))
+
+    def on_resize(self, event):
+        self.visible_rows = max(1, event.height // self.ROW_HEIGHT - 1)
+        self.dirty = True
+
+    def apply_filter(self):
+        keys = []
+        if self.type_var.get():
+            keys.append(('type', self.type_var.get()))
+        for kind, var in (('vehicle', self.vehicle_var), ('rsu', self.rsu_var)):
+            text = var.get().strip()
+            if text.lstrip('-').isdigit():
+                keys.append((kind, int(text)))
+        self.buffer.set_filter(keys)
+        self.follow = True
+        self.dirty = True
 
 class SimVisualizer:
-    def __init__(self):
+    """Pygame view of the road.
+
+    Road, RSU zones and intersections come from the scenario config and are
+    drawn once per resize into a static layer. Each frame only the areas that
+    held or now hold a vehicle are restored from that layer, redrawn and
+    pushed to the display. Label glyphs are cached per vehicle id, labels that
+    would overlap are skipped, and above DENSITY_THRESHOLD vehicles the road
+    is drawn as a per-column density strip instead of individual vehicles.
+    Vehicle states come from process_message() or, in live mode, from
+    apply_snapshot().
+    """
+    DENSITY_THRESHOLD = 500   # vehicles; above this, draw density instead of circles
+    DENSITY_BIN = 3           # px per density column
+    LABEL_MIN_GAP = 16        # px between two drawn labels
+    MERGE_RECTS = 64          # past this many dirty rects, update their union instead
+    VEHICLE_RADIUS = 8
+
+    def __init__(self, config=None):
         pygame.init()
         self.width, self.height = 950, 300
         
@@ -70,20 +282,58 @@ class SimVisualizer:
         
         self.vehicle_states = {}
 
-        self.world_width = 1000.0 
+        # Scenario geometry (falls back to the values of scenario_simple.yaml)
+        if config:
+            self.rsu_zones = [(site["position"], site["range"]) for site in rsu_sites(config)]
+            self.intersections = sorted(config["intersections"]["positions"])
+        else:
+            self.rsu_zones = [(100, 200)]
+            self.intersections = [200, 400, 600, 800]
+        furthest = max([p + r for p, r in self.rsu_zones] + list(self.intersections) + [0])
+        self.world_width = furthest * 1.25 if furthest > 0 else 1000.0
         self.scale_factor = self.width / self.world_width
-
-        self.rsu_position = 100; self.rsu_range = 200 # These are the config values
-        self.intersections = [200, 400, 600, 800]
         
         self.BG_COLOR = (240, 240, 240); self.ROAD_COLOR = (50, 50, 50)
         self.VEHICLE_COLOR = (200, 0, 0); self.WAITING_VEHICLE_COLOR = (255, 140, 0)
         self.RSU_COLOR = (0, 150, 200); self.INTERSECTION_COLOR = (200, 200, 0)
 
+        self.label_cache = {}
+        self.prev_rects = []
+        self.changed = True
+        self._build_static_layer()
+
     def handle_resize(self, event):
         self.width, self.height = event.w, event.h
         self.screen = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
         self.scale_factor = self.width / self.world_width
+        self._build_static_layer()
+
+    def _build_static_layer(self):
+        layer = pygame.Surface((self.width, self.height)).convert()
+        layer.fill(self.BG_COLOR)
+        road_y = self.height // 2
+        
+        pygame.draw.line(layer, self.ROAD_COLOR, (0, road_y), (self.width, road_y), 5)
+
+        for rsu_position, rsu_range in set(self.rsu_zones):
+            rsu_start_x = int(rsu_position * self.scale_factor)
+            rsu_width = max(1, int(rsu_range * self.scale_factor))
+            rsu_surface = pygame.Surface((rsu_width, 100), pygame.SRCALPHA)
+            rsu_surface.fill((*self.RSU_COLOR, 50))
+            layer.blit(rsu_surface, (rsu_start_x, road_y - 50))
+        
+        for pos in self.intersections:
+            intersection_x = int(pos * self.scale_factor)
+            pygame.draw.line(layer, self.INTERSECTION_COLOR, (intersection_x, road_y - 20), (intersection_x, road_y + 20), 3)
+
+        self.static_layer = layer
+        self.full_redraw = True
+
+    def _label(self, vid):
+        text = self.label_cache.get(vid)
+        if text is None:
+            text = self.label_cache[vid] = self.font.render(str(vid), True, (0,0,0))
+        return text
 
     def process_message(self, message):
         msg_type = message.get("type")
@@ -95,34 +345,81 @@ class SimVisualizer:
             if msg_type == "VEHICLE_MOVE":
                 self.vehicle_states[vid]["pos"] = message["pos"]
                 self.vehicle_states[vid]["waiting"] = False
+                self.changed = True
             elif msg_type == "VEHICLE_WAIT_START":
                 self.vehicle_states[vid]["pos"] = message["pos"]
                 self.vehicle_states[vid]["waiting"] = True
+                self.changed = True
 
-    def draw(self):
-        self.screen.fill(self.BG_COLOR)
-        road_y = self.height // 2
-        
-        pygame.draw.line(self.screen, self.ROAD_COLOR, (0, road_y), (self.width, road_y), 5)
-
-        rsu_start_x = int(self.rsu_position * self.scale_factor)
-        rsu_width = int(self.rsu_range * self.scale_factor)
-        
-        rsu_surface = pygame.Surface((rsu_width, 100), pygame.SRCALPHA)
-        rsu_surface.fill((*self.RSU_COLOR, 50))
-        self.screen.blit(rsu_surface, (rsu_start_x, road_y - 50))
-        
-        for pos in self.intersections:
-            intersection_x = int(pos * self.scale_factor)
-            pygame.draw.line(self.screen, self.INTERSECTION_COLOR, (intersection_x, road_y - 20), (intersection_x, road_y + 20), 3)
+    def apply_snapshot(self, snapshot):
+        """Takes every vehicle's state from a statetable Snapshot instead of move events."""
+        self.vehicle_states = {vid: {"pos": pos, "waiting": speed == 0}
+                               for vid, (pos, speed) in enumerate(zip(snapshot.pos, snapshot.speed))
+                               if pos == pos}   # NaN: not on the road yet
+        self.changed = True
 
+    def _draw_vehicles(self, road_y):
+        rects = []
+        radius = self.VEHICLE_RADIUS
+        visible = []
         for vid, state in self.vehicle_states.items():
             pos_x = int(state["pos"] * self.scale_factor)
-            color = self.WAITING_VEHICLE_COLOR if state["waiting"] else self.VEHICLE_COLOR
-            pygame.draw.circle(self.screen, color, (pos_x, road_y), 8)
-            text = self.font.render(str(vid), True, (0,0,0))
-            self.screen.blit(text, (pos_x - 5, road_y - 25))
+            if -radius <= pos_x <= self.width + radius:
+                visible.append((pos_x, vid, state["waiting"]))
+        visible.sort()
+
+        last_label_x = None
+        for pos_x, vid, waiting in visible:
+            color = self.WAITING_VEHICLE_COLOR if waiting else self.VEHICLE_COLOR
+            rects.append(pygame.draw.circle(self.screen, color, (pos_x, road_y), radius))
+            # Cull labels that would overlap the previous one
+            if last_label_x is None or pos_x - last_label_x >= self.LABEL_MIN_GAP:
+                rects.append(self.screen.blit(self._label(vid), (pos_x - 5, road_y - 25)))
+                last_label_x = pos_x
+        return rects
+
+    def _draw_density(self, road_y):
+        # One bar per DENSITY_BIN-px column; height grows with the number of vehicles there
+        counts, waiting = {}, set()
+        for state in self.vehicle_states.values():
+            col = int(state["pos"] * self.scale_factor) // self.DENSITY_BIN
+            counts[col] = counts.get(col, 0) + 1
+            if state["waiting"]:
+                waiting.add(col)
+        rects = []
+        for col, n in counts.items():
+            x = col * self.DENSITY_BIN
+            if not 0 <= x < self.width:
+                continue
+            half = min(40, 4 + 4 * n.bit_length())
+            color = self.WAITING_VEHICLE_COLOR if col in waiting else self.VEHICLE_COLOR
+            rects.append(self.screen.fill(color, (x, road_y - half, self.DENSITY_BIN, 2 * half)))
+        return rects
+
+    def draw(self):
+        if not self.changed and not self.full_redraw:
+            return
+        road_y = self.height // 2
 
-        pygame.display.flip()
+        # Restore the static layer where vehicles were drawn last frame
+        if self.full_redraw:
+            self.screen.blit(self.static_layer, (0, 0))
+        else:
+            for rect in self.prev_rects:
+                self.screen.blit(self.static_layer, rect, rect)
 
+        if len(self.vehicle_states) > self.DENSITY_THRESHOLD:
+            rects = self._draw_density(road_y)
+        else:
+            rects = self._draw_vehicles(road_y)
 
+        if self.full_redraw:
+            pygame.display.flip()
+        else:
+            dirty = self.prev_rects + rects
+            if len(dirty) > self.MERGE_RECTS:
+                dirty = [dirty[0].unionall(dirty[1:])]
+            pygame.display.update(dirty)
+        self.prev_rects = rects
+        self.full_redraw = False
+        self.changed = False